@@ -1,6 +1,6 @@
 {
     'name': 'Estado de Cuenta - Reporte de Clientes',
-    'version': '19.0.1.9.0',
+    'version': '19.0.1.10.0',
     'category': 'Sales/Sales',
     'summary': 'Reporte PDF de estado de cuenta por cliente y/o proyecto',
     'author': 'Alphaqueb Consulting SAS',
@@ -15,11 +15,17 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'security/account_statement_security.xml',
+        'data/ir_cron.xml',
         'wizard/account_statement_wizard_views.xml',
         'report/account_statement_report.xml',
         'report/account_statement_templates.xml',
         'views/menu_views.xml',
         'views/sale_order_views.xml',
+        'views/account_statement_batch_views.xml',
+        'views/account_statement_run_views.xml',
+        'views/account_statement_job_views.xml',
+        'views/account_statement_aging_views.xml',
     ],
     'installable': True,
     'application': False,
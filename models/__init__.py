@@ -1,3 +1,17 @@
 # -*- coding: utf-8 -*-
 from . import sale_order
-from . import account_statement_parser
\ No newline at end of file
+from . import account_move
+from . import account_partial_reconcile
+from . import account_statement_credit_ledger
+from . import account_statement_rate_provider
+from . import account_statement_order_cache
+from . import account_statement_pdf_cache
+from . import ir_config_parameter
+from . import res_currency_rate
+from . import account_statement_batch
+from . import account_statement_job
+from . import account_statement_aging
+from . import account_statement_benchmark
+from . import account_statement_run
+from . import account_statement_parser
+from . import ir_actions_report
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _statement_invalidate_credit(self):
+        """Marca sucio el saldo global de los clientes de estas facturas."""
+        invoices = self.filtered(lambda m: m.move_type == 'out_invoice')
+        if invoices:
+            self.env['account.statement.credit.ledger'].sudo()._invalidate_partners(
+                invoices.partner_id
+            )
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        posted._statement_invalidate_credit()
+        return posted
+
+    def button_draft(self):
+        res = super().button_draft()
+        self._statement_invalidate_credit()
+        return res
+
+    def button_cancel(self):
+        res = super().button_cancel()
+        self._statement_invalidate_credit()
+        return res
+
+    def unlink(self):
+        self._statement_invalidate_credit()
+        return super().unlink()
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    def _statement_invalidate_credit(self):
+        """Marca sucio el saldo global de los clientes conciliados."""
+        partners = self.debit_move_id.partner_id | self.credit_move_id.partner_id
+        if partners:
+            self.env['account.statement.credit.ledger'].sudo()._invalidate_partners(partners)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super().create(vals_list)
+        partials._statement_invalidate_credit()
+        return partials
+
+    def unlink(self):
+        self._statement_invalidate_credit()
+        return super().unlink()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+from datetime import datetime, time, timedelta
+
+_logger = logging.getLogger(__name__)
+
+AGING_BUCKETS = (
+    ('bucket_0_30', 0, 30),
+    ('bucket_31_60', 31, 60),
+    ('bucket_61_90', 61, 90),
+    ('bucket_90_plus', 91, None),
+)
+
+
+class AccountStatementAging(models.TransientModel):
+    """Antigüedad de saldos y saldo a favor de toda la cartera.
+
+    Una línea por cliente comercial con el saldo materializado de sus órdenes
+    confirmadas (el mismo del estado de cuenta), calculada con agregados
+    agrupados sobre las columnas indexadas de `sale.order`.
+    """
+    _name = 'account.statement.aging'
+    _description = 'Antigüedad de Saldos de Clientes'
+    _order = 'balance_mxn desc'
+
+    partner_id = fields.Many2one('res.partner', string='Cliente', readonly=True)
+    open_orders = fields.Integer(string='Órdenes Abiertas', readonly=True, aggregator='sum')
+    balance_usd = fields.Float(string='Saldo Órdenes USD', digits=(16, 2), readonly=True, aggregator='sum')
+    balance_mxn_orders = fields.Float(string='Saldo Órdenes MXN', digits=(16, 2), readonly=True, aggregator='sum')
+    balance_mxn = fields.Float(string='Saldo Neto (MXN)', digits=(16, 2), readonly=True, aggregator='sum')
+    bucket_0_30 = fields.Float(string='0-30 días', digits=(16, 2), readonly=True, aggregator='sum')
+    bucket_31_60 = fields.Float(string='31-60 días', digits=(16, 2), readonly=True, aggregator='sum')
+    bucket_61_90 = fields.Float(string='61-90 días', digits=(16, 2), readonly=True, aggregator='sum')
+    bucket_90_plus = fields.Float(string='+90 días', digits=(16, 2), readonly=True, aggregator='sum')
+    customer_credit_mxn = fields.Float(string='Saldo a Favor (MXN)', digits=(16, 2), readonly=True, aggregator='sum')
+    rate = fields.Float(string='Tipo de Cambio Banorte', digits=(12, 4), readonly=True, aggregator=False)
+
+    @api.model
+    def action_open_report(self):
+        """Recalcula la cartera del usuario y abre el reporte."""
+        self.search([('create_uid', '=', self.env.uid)]).unlink()
+        self.create(self._compute_aging_lines())
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Antigüedad de Saldos',
+            'res_model': self._name,
+            'view_mode': 'list,pivot',
+            'domain': [('create_uid', '=', self.env.uid)],
+            'context': {'search_default_filter_owing': 1},
+        }
+
+    @api.model
+    def _compute_aging_lines(self, today=None):
+        """Valores de las líneas del reporte, un dict por cliente comercial.
+
+        Suma los saldos materializados de la orden (`x_statement_balance`,
+        `x_statement_balance_mxn`), los mismos del estado de cuenta.
+        Antigüedad por `date_order`: las órdenes con fecha futura cuentan en
+        0-30 días. Los buckets suman solo órdenes con saldo pendiente; el
+        saldo neto incluye las órdenes con saldo a favor.
+        """
+        SaleOrder = self.env['sale.order']
+        rate = SaleOrder._statement_banorte_rate()
+        today = today or fields.Date.context_today(self)
+        partner_path = 'partner_id.commercial_partner_id'
+        domain = [
+            ('state', 'in', ['sale', 'done']),
+            ('company_id', 'in', self.env.companies.ids),
+        ]
+
+        open_orders = {
+            partner.id: count
+            for partner, count in SaleOrder._read_group(
+                domain + [('x_statement_is_open', '=', True)], [partner_path], ['__count'],
+            )
+        }
+        lines = {}
+        for partner, currency, balance, balance_mxn in SaleOrder._read_group(
+            domain, [partner_path, 'currency_id'],
+            ['x_statement_balance:sum', 'x_statement_balance_mxn:sum'],
+        ):
+            if not open_orders.get(partner.id):
+                continue
+            vals = lines.setdefault(partner.id, dict(
+                {name: 0.0 for name, _low, _high in AGING_BUCKETS},
+                partner_id=partner.id,
+                open_orders=open_orders[partner.id],
+                balance_usd=0.0,
+                balance_mxn_orders=0.0,
+                balance_mxn=0.0,
+                rate=rate,
+            ))
+            if currency.name == 'USD':
+                vals['balance_usd'] += balance
+            elif currency.name == 'MXN':
+                vals['balance_mxn_orders'] += balance
+            vals['balance_mxn'] += balance_mxn
+
+        for name, low, high in AGING_BUCKETS:
+            bucket_domain = domain + [('x_statement_balance', '>', 0.01)]
+            if low:
+                # Edad en días = hoy - fecha de la orden.
+                bucket_domain.append(('date_order', '<', self._aging_boundary(today, low - 1)))
+            if high is not None:
+                bucket_domain.append(('date_order', '>=', self._aging_boundary(today, high)))
+            for partner, balance_mxn in SaleOrder._read_group(
+                bucket_domain, [partner_path], ['x_statement_balance_mxn:sum'],
+            ):
+                if partner.id in lines:
+                    lines[partner.id][name] = balance_mxn
+
+        for vals in lines.values():
+            vals['customer_credit_mxn'] = -vals['balance_mxn'] if vals['balance_mxn'] < -0.01 else 0.0
+        _logger.info("Antigüedad de saldos: %s clientes con saldo", len(lines))
+        return list(lines.values())
+
+    @api.model
+    def _aging_boundary(self, today, days):
+        """Inicio del día `today - days`: las órdenes desde ahí tienen a lo más `days` días."""
+        return datetime.combine(today - timedelta(days=days), time.min)
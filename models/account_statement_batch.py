@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval
+import logging
+import time
+
+from .statement_workers import get_max_workers, run_in_workers, split_chunks
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountStatementBatch(models.Model):
+    """Generación masiva de estados de cuenta (cierre de mes).
+
+    Toma un dominio de clientes y los filtros del wizard, reparte los clientes
+    en chunks y los procesa en hilos con cursor propio desde el cron. Cada
+    estado de cuenta se adjunta al cliente; un error en un cliente no detiene
+    al resto. Un lote que quedó en proceso (el worker murió) se reanuda en la
+    siguiente ejecución del cron con sus líneas pendientes.
+    """
+    _name = 'account.statement.batch'
+    _description = 'Generación Masiva de Estados de Cuenta'
+    _order = 'id desc'
+
+    name = fields.Char(string='Descripción', required=True, default='Estados de Cuenta')
+    partner_domain = fields.Char(
+        string='Clientes', required=True,
+        default="[('customer_rank', '>', 0)]",
+    )
+    date_from = fields.Date(string='Desde')
+    date_to = fields.Date(string='Hasta')
+    include_draft = fields.Boolean(string='Incluir Cotizaciones (Borrador)', default=False)
+    include_fully_paid = fields.Boolean(string='Incluir Pagadas al 100%', default=False)
+    report_currency = fields.Selection([
+        ('auto', 'Automática (según órdenes)'),
+        ('mxn', 'Pesos Mexicanos (MXN)'),
+        ('usd', 'Dólares (USD)'),
+        ('both', 'Multi-moneda (USD + MXN)'),
+    ], string='Divisa del Reporte', required=True, default='auto')
+
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En Cola'),
+        ('running', 'En Proceso'),
+        ('done', 'Terminado'),
+    ], string='Estado', default='draft', required=True, readonly=True)
+    line_ids = fields.One2many('account.statement.batch.line', 'batch_id', string='Clientes', readonly=True)
+    date_start = fields.Datetime(string='Inicio', readonly=True)
+    date_end = fields.Datetime(string='Fin', readonly=True)
+
+    total_count = fields.Integer(string='Total', compute='_compute_progress')
+    done_count = fields.Integer(string='Generados', compute='_compute_progress')
+    skipped_count = fields.Integer(string='Sin Órdenes', compute='_compute_progress')
+    failed_count = fields.Integer(string='Con Error', compute='_compute_progress')
+    progress = fields.Float(string='Avance (%)', compute='_compute_progress')
+    statements_per_minute = fields.Float(string='Estados por Minuto', digits=(12, 2), compute='_compute_progress')
+
+    @api.depends('line_ids.state', 'date_start', 'date_end')
+    def _compute_progress(self):
+        counts = {
+            (batch.id, state): count
+            for batch, state, count in self.env['account.statement.batch.line']._read_group(
+                [('batch_id', 'in', self.ids)], ['batch_id', 'state'], ['__count'],
+            )
+        }
+        now = fields.Datetime.now()
+        for batch in self:
+            done = counts.get((batch.id, 'done'), 0)
+            skipped = counts.get((batch.id, 'skipped'), 0)
+            failed = counts.get((batch.id, 'failed'), 0)
+            pending = counts.get((batch.id, 'pending'), 0)
+            total = done + skipped + failed + pending
+            batch.total_count = total
+            batch.done_count = done
+            batch.skipped_count = skipped
+            batch.failed_count = failed
+            batch.progress = (total - pending) / total * 100 if total else 0.0
+            minutes = 0.0
+            if batch.date_start:
+                minutes = ((batch.date_end or now) - batch.date_start).total_seconds() / 60
+            batch.statements_per_minute = done / minutes if minutes > 0 else 0.0
+
+    def action_queue(self):
+        """Crea una línea por cliente y deja el lote en cola para el cron."""
+        for batch in self:
+            if batch.state != 'draft':
+                raise UserError("Solo se pueden encolar lotes en borrador.")
+            # Se conservan los contactos encontrados: el wizard filtra las
+            # órdenes por el `partner_id` exacto.
+            partners = self.env['res.partner'].search(safe_eval(batch.partner_domain or '[]'))
+            if not partners:
+                raise UserError("El dominio no encontró clientes.")
+            batch.line_ids.unlink()
+            self.env['account.statement.batch.line'].create([
+                {'batch_id': batch.id, 'partner_id': partner.id}
+                for partner in partners
+            ])
+            batch.state = 'queued'
+        self.env.ref('account_statement_report.ir_cron_account_statement_batch')._trigger()
+        return True
+
+    def action_reset(self):
+        self.write({'state': 'draft', 'date_start': False, 'date_end': False})
+        self.line_ids.unlink()
+        return True
+
+    @api.model
+    def _cron_process_batches(self):
+        # Solo este cron procesa lotes y el cron no corre dos veces a la vez:
+        # un lote en proceso al arrancar quedó interrumpido y se reanuda.
+        for batch in self.search([('state', 'in', ('running', 'queued'))], order='id'):
+            if batch.state == 'running':
+                _logger.warning("Reanudando lote de estados de cuenta interrumpido %s", batch.id)
+            batch._process()
+
+    def _process(self):
+        """Procesa las líneas pendientes del lote en paralelo."""
+        self.ensure_one()
+        self.write({
+            'state': 'running',
+            'date_start': self.date_start if self.state == 'running' else fields.Datetime.now(),
+            'date_end': False,
+        })
+        # Los hilos trabajan con su propio cursor: el estado debe ser visible.
+        self.env.cr.commit()
+
+        pending = self.line_ids.filtered(lambda l: l.state == 'pending')
+        ICP = self.env['ir.config_parameter'].sudo()
+        chunk_size = int(ICP.get_param('account_statement_report.bulk_chunk_size', 50))
+        workers = get_max_workers(self.env, 'account_statement_report.bulk_workers')
+        chunks = split_chunks(pending.ids, chunk_size)
+        _logger.info(
+            "Lote de estados de cuenta %s: %s clientes, %s chunks, %s hilos",
+            self.id, len(pending), len(chunks), workers,
+        )
+
+        run_in_workers(self.env, chunks, _process_line_chunk, workers)
+
+        self.invalidate_recordset()
+        self.line_ids.invalidate_recordset()
+        self.write({'state': 'done', 'date_end': fields.Datetime.now()})
+        self.env.cr.commit()
+        _logger.info(
+            "Lote de estados de cuenta %s terminado: %s generados, %s sin órdenes, "
+            "%s con error, %.2f estados/min",
+            self.id, self.done_count, self.skipped_count, self.failed_count,
+            self.statements_per_minute,
+        )
+
+    def _render_partner_statement(self, partner):
+        """Genera el PDF de un cliente y lo adjunta a su ficha."""
+        self.ensure_one()
+        wizard = self.env['account.statement.wizard'].create({
+            'partner_id': partner.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'include_draft': self.include_draft,
+            'include_fully_paid': self.include_fully_paid,
+        })
+        if self.report_currency == 'auto':
+            wizard.report_currency = wizard._detect_report_currency()
+        else:
+            wizard.report_currency = self.report_currency
+        pdf_content, filename = wizard._render_statement_pdf()
+        return self.env['ir.attachment'].create({
+            'name': filename,
+            'type': 'binary',
+            'raw': pdf_content,
+            'res_model': 'res.partner',
+            'res_id': partner.id,
+            'mimetype': 'application/pdf',
+        })
+
+
+def _process_line_chunk(env, line_ids):
+    """Worker: genera los estados de cuenta de un chunk de líneas."""
+    for line in env['account.statement.batch.line'].browse(line_ids):
+        line._generate()
+        env.cr.commit()
+
+
+class AccountStatementBatchLine(models.Model):
+    _name = 'account.statement.batch.line'
+    _description = 'Cliente de Generación Masiva de Estados de Cuenta'
+    _order = 'id'
+
+    batch_id = fields.Many2one('account.statement.batch', required=True, ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente', required=True, ondelete='cascade')
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Generado'),
+        ('skipped', 'Sin Órdenes'),
+        ('failed', 'Error'),
+    ], string='Estado', default='pending', required=True, index=True)
+    attachment_id = fields.Many2one('ir.attachment', string='PDF', ondelete='set null')
+    message = fields.Char(string='Mensaje')
+    duration = fields.Float(string='Duración (s)', digits=(12, 2))
+
+    def _generate(self):
+        """Genera el estado de cuenta de la línea aislando cualquier error."""
+        self.ensure_one()
+        start = time.perf_counter()
+        vals = {}
+        try:
+            with self.env.cr.savepoint():
+                attachment = self.batch_id._render_partner_statement(self.partner_id)
+            vals = {'state': 'done', 'attachment_id': attachment.id, 'message': False}
+        except UserError as exc:
+            vals = {'state': 'skipped', 'message': str(exc)}
+        except Exception as exc:
+            _logger.exception("Error generando estado de cuenta del cliente %s", self.partner_id.id)
+            vals = {'state': 'failed', 'message': str(exc)[:250]}
+        vals['duration'] = time.perf_counter() - start
+        self.write(vals)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+import json
+import logging
+import random
+import resource
+import time
+import tracemalloc
+
+from .statement_workers import run_in_workers
+
+_logger = logging.getLogger(__name__)
+
+STATEMENT_REPORT_REF = 'account_statement_report.action_report_account_statement'
+
+
+def _render_order_statements(env, order_ids):
+    """Worker: imprime (PDF) el estado de cuenta directo de cada orden."""
+    Report = env['ir.actions.report']
+    for order in env['sale.order'].browse(order_ids):
+        Report._render_qweb_pdf(STATEMENT_REPORT_REF, None, data={
+            'order_id': order.id,
+            'report_currency': order._statement_report_currency(),
+        })
+    return len(order_ids)
+
+
+class _RollbackBenchmark(Exception):
+    """Se lanza al final del benchmark para deshacer los datos sintéticos."""
+
+
+class AccountStatementBenchmark(models.AbstractModel):
+    """Benchmark de los puntos calientes del estado de cuenta.
+
+    Genera un cliente sintético (órdenes USD/MXN, líneas, facturas, pagos
+    parciales y devoluciones SOM) dentro de un savepoint, mide cada fase por
+    separado (tiempo, consultas SQL y memoria pico) y deshace los datos. El
+    resultado se guarda como JSON para comparar entre versiones del módulo.
+
+    Uso desde `odoo shell`::
+
+        env['account.statement.benchmark']._run(orders=200, lines=20)
+    """
+    _name = 'account.statement.benchmark'
+    _description = 'Benchmark de Estado de Cuenta'
+
+    @api.model
+    def _run(self, orders=50, lines=10, invoices_per_order=1, payments_per_invoice=2,
+             returns_per_order=1, usd_ratio=0.5, render_pdf=False, seed=42, output_path=None):
+        """Ejecuta el benchmark y retorna el dict de resultados."""
+        if not self.env.is_superuser():
+            raise UserError("El benchmark solo puede ejecutarse como superusuario.")
+        params = {
+            'orders': orders,
+            'lines': lines,
+            'invoices_per_order': invoices_per_order,
+            'payments_per_invoice': payments_per_invoice,
+            'returns_per_order': returns_per_order,
+            'usd_ratio': usd_ratio,
+            'render_pdf': render_pdf,
+            'seed': seed,
+        }
+        result = {
+            'module_version': self.env['ir.module.module'].search(
+                [('name', '=', 'account_statement_report')], limit=1,
+            ).latest_version,
+            'date': fields.Datetime.to_string(fields.Datetime.now()),
+            'params': params,
+            'phases': [],
+        }
+        try:
+            with self.env.cr.savepoint():
+                generated = self._generate_data(random.Random(seed), **{
+                    k: v for k, v in params.items() if k not in ('render_pdf', 'seed')
+                })
+                result['dataset'] = generated['counts']
+                self._measure_phases(generated, result['phases'], render_pdf)
+                raise _RollbackBenchmark()
+        except _RollbackBenchmark:
+            pass
+        self.env.invalidate_all()
+
+        payload = json.dumps(result, indent=2, default=str)
+        self.env['ir.attachment'].create({
+            'name': 'account_statement_benchmark_%s.json' % result['date'].replace(' ', '_'),
+            'type': 'binary',
+            'raw': payload.encode(),
+            'mimetype': 'application/json',
+            'res_model': self._name,
+        })
+        if output_path:
+            with open(output_path, 'w') as fh:
+                fh.write(payload)
+        for phase in result['phases']:
+            _logger.info(
+                "BENCHMARK %s: %.3fs, %s consultas, %.1f KiB pico, %.1f KiB retenidos, RSS %s KiB",
+                phase['name'], phase['seconds'], phase['queries'], phase['peak_kib'],
+                phase['retained_kib'], phase['rss_kib'],
+            )
+        return result
+
+    # ═══════════════════════════════════════════════════════════════════
+    # Concurrencia del estado de cuenta directo de una orden
+    # ═══════════════════════════════════════════════════════════════════
+
+    @api.model
+    def _run_order_concurrency(self, order_ids, levels=(1, 2, 4, 8), requests_per_worker=5):
+        """Mide el estado de cuenta directo de orden con N peticiones en paralelo.
+
+        Cada hilo usa su propio cursor, así que las órdenes deben existir ya
+        confirmadas en la base (no sirven los datos sintéticos de `_run`).
+        `efficiency` cercano a 1.0 indica escalamiento lineal: el camino
+        directo (`_render_qweb_pdf`, como al imprimir desde la orden) no
+        escribe filas que compitan entre peticiones.
+        """
+        if not self.env.is_superuser():
+            raise UserError("El benchmark solo puede ejecutarse como superusuario.")
+        order_ids = list(order_ids)
+        results = []
+        for workers in levels:
+            chunks = [order_ids * requests_per_worker for _worker in range(workers)]
+            start = time.perf_counter()
+            statements = sum(run_in_workers(self.env, chunks, _render_order_statements, workers))
+            seconds = time.perf_counter() - start
+            results.append({
+                'workers': workers,
+                'statements': statements,
+                'seconds': seconds,
+                'per_second': statements / seconds if seconds else 0.0,
+            })
+        base = results[0]['per_second'] if results else 0.0
+        for result in results:
+            result['efficiency'] = result['per_second'] / (base * result['workers']) if base else 0.0
+            _logger.info(
+                "BENCHMARK orden directa: %s hilos, %s estados, %.2f/s, eficiencia %.2f",
+                result['workers'], result['statements'], result['per_second'], result['efficiency'],
+            )
+        return results
+
+    # ═══════════════════════════════════════════════════════════════════
+    # Medición
+    # ═══════════════════════════════════════════════════════════════════
+
+    @api.model
+    def _measure(self, phases, name, func):
+        """Mide `func()` y agrega la fase a `phases`.
+
+        `retained_kib` es la memoria Python que sigue viva al terminar (p. ej.
+        `orders_data`); `rss_kib` es el RSS máximo del proceso y
+        `rss_growth_kib` cuánto lo elevó esta fase.
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        cr = self.env.cr
+        queries_before = cr.sql_log_count
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            value = func()
+        finally:
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        phases.append({
+            'name': name,
+            'seconds': seconds,
+            'queries': cr.sql_log_count - queries_before,
+            'peak_kib': peak / 1024.0,
+            'retained_kib': current / 1024.0,
+            'rss_kib': rss_after,
+            'rss_growth_kib': rss_after - rss_before,
+        })
+        return value
+
+    @api.model
+    def _measure_phases(self, generated, phases, render_pdf):
+        partner = generated['partner']
+        orders = generated['orders']
+        Ledger = self.env['account.statement.credit.ledger'].sudo()
+        Wizard = self.env['account.statement.wizard']
+
+        def credit_balance():
+            Ledger._invalidate_partners(partner)
+            orders._compute_customer_credit_balance()
+
+        self._measure(phases, 'compute_customer_credit_balance', credit_balance)
+        self._measure(phases, 'compute_customer_credit_balance_warm',
+                      lambda: orders._compute_customer_credit_balance())
+
+        wizard = Wizard.create({
+            'partner_id': partner.id,
+            'include_fully_paid': True,
+            'report_currency': 'both',
+        })
+        # Detección de monedas con un conteo agrupado (_compute_filter_evaluation).
+        self._measure(phases, 'compute_available_orders_and_currency_detection',
+                      lambda: wizard._compute_filter_evaluation())
+
+        self._measure(phases, 'action_print_statement_cold',
+                      lambda: wizard.with_context(statement_cache_bypass=True)._prepare_statement_data())
+        self._measure(phases, 'action_print_statement_warm',
+                      lambda: wizard._prepare_statement_data())
+
+        reference = wizard._prepare_report_reference()
+        Report = self.env['ir.actions.report']
+        report_ref = STATEMENT_REPORT_REF
+        self._measure(phases, 'render_qweb_html',
+                      lambda: Report._render_qweb_html(report_ref, wizard.ids, data=reference))
+        order = orders[:1]
+        self._measure(phases, 'order_statement_direct_html',
+                      lambda: Report._render_qweb_html(report_ref, None, data={
+                          'order_id': order.id,
+                          'report_currency': order._statement_report_currency(),
+                      }))
+        if render_pdf:
+            # Primera impresión: render completo y alta en la caché de PDF.
+            self._measure(phases, 'render_qweb_pdf',
+                          lambda: Report._render_qweb_pdf(report_ref, wizard.ids, data=reference))
+            self._measure(phases, 'render_qweb_pdf_cached',
+                          lambda: Report._render_qweb_pdf(report_ref, wizard.ids, data=reference))
+
+    # ═══════════════════════════════════════════════════════════════════
+    # Generador de datos sintéticos
+    # ═══════════════════════════════════════════════════════════════════
+
+    @api.model
+    def _generate_data(self, rng, orders, lines, invoices_per_order, payments_per_invoice,
+                       returns_per_order, usd_ratio):
+        """Crea un cliente con órdenes, facturas, pagos y devoluciones."""
+        usd = self.env.ref('base.USD')
+        mxn = self.env.ref('base.MXN')
+        (usd | mxn).write({'active': True})
+        pricelists = {
+            'USD': self.env['product.pricelist'].create({'name': 'Benchmark USD', 'currency_id': usd.id}),
+            'MXN': self.env['product.pricelist'].create({'name': 'Benchmark MXN', 'currency_id': mxn.id}),
+        }
+        partner = self.env['res.partner'].create({'name': 'Benchmark Estado de Cuenta', 'customer_rank': 1})
+        products = self.env['product.product'].create([
+            {
+                'name': 'Benchmark Material %s' % i,
+                'type': 'consu',
+                'invoice_policy': 'order',
+                'list_price': rng.uniform(10, 500),
+            }
+            for i in range(max(lines, 1))
+        ])
+        service = self.env['product.product'].create({
+            'name': 'Benchmark Servicio',
+            'type': 'service',
+            'invoice_policy': 'order',
+            'list_price': 100.0,
+        })
+
+        order_vals = []
+        for i in range(orders):
+            currency = 'USD' if rng.random() < usd_ratio else 'MXN'
+            order_vals.append({
+                'partner_id': partner.id,
+                'pricelist_id': pricelists[currency].id,
+                'order_line': [
+                    (0, 0, {
+                        'product_id': products[j % len(products)].id,
+                        'product_uom_qty': rng.randint(1, 50),
+                        'price_unit': rng.uniform(10, 500),
+                    })
+                    for j in range(lines)
+                ] + [(0, 0, {'product_id': service.id, 'product_uom_qty': 1, 'price_unit': 100.0})],
+            })
+        sale_orders = self.env['sale.order'].create(order_vals)
+        sale_orders.action_confirm()
+
+        invoices = self.env['account.move']
+        for order in sale_orders:
+            for _i in range(invoices_per_order):
+                invoices |= order._create_invoices(final=True)
+        invoices.action_post()
+
+        payments = 0
+        for invoice in invoices:
+            for _i in range(payments_per_invoice):
+                pay_currency = usd if rng.random() < 0.5 else mxn
+                amount = invoice.amount_total / (payments_per_invoice + 1)
+                self.env['account.payment.register'].with_context(
+                    active_model='account.move', active_ids=invoice.ids,
+                ).create({
+                    'amount': amount,
+                    'currency_id': pay_currency.id,
+                })._create_payments()
+                payments += 1
+
+        returns = 0
+        Document = self.env['sale.delivery.document']
+        for order in sale_orders:
+            material_lines = order.order_line.filtered(lambda l: l.product_id.type != 'service')
+            for _i in range(returns_per_order):
+                try:
+                    with self.env.cr.savepoint():
+                        Document.create({
+                            'sale_order_id': order.id,
+                            'document_type': 'return',
+                            'state': 'confirmed',
+                            'line_ids': [
+                                (0, 0, {
+                                    'sale_line_id': line.id,
+                                    'product_id': line.product_id.id,
+                                    'qty_returned': 1.0,
+                                })
+                                for line in material_lines[:3]
+                            ],
+                        })
+                    returns += 1
+                except Exception as exc:
+                    _logger.warning("BENCHMARK: no se pudo crear devolución SOM: %s", exc)
+                    break
+
+        return {
+            'partner': partner,
+            'orders': sale_orders,
+            'counts': {
+                'orders': len(sale_orders),
+                'order_lines': len(sale_orders.order_line),
+                'invoices': len(invoices),
+                'payments': payments,
+                'return_documents': returns,
+            },
+        }
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountStatementCreditLedger(models.Model):
+    """Saldo global por cliente comercial (materializado).
+
+    Guarda el neto en MXN de TODAS las órdenes confirmadas del cliente y el
+    saldo a favor resultante. Las conciliaciones, facturas y cambios en las
+    órdenes solo marcan la fila como sucia; el recálculo ocurre al leerla y
+    solo para los clientes afectados.
+    """
+    _name = 'account.statement.credit.ledger'
+    _description = 'Saldo Global de Cliente (Estado de Cuenta)'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one(
+        'res.partner', string='Cliente', required=True,
+        ondelete='cascade', index=True,
+    )
+    balance_mxn = fields.Float(string='Saldo Neto MXN', readonly=True)
+    credit_mxn = fields.Float(string='Saldo a Favor MXN', readonly=True)
+    rate = fields.Float(string='Tipo de Cambio Usado', digits=(12, 4), readonly=True)
+    is_dirty = fields.Boolean(string='Pendiente de Recalcular', default=True, readonly=True)
+
+    _partner_uniq = models.Constraint(
+        'UNIQUE(partner_id)',
+        'Solo puede existir un saldo global por cliente.',
+    )
+
+    @api.model
+    def _invalidate_partners(self, partners):
+        """Marca como sucio el saldo de los clientes comerciales indicados."""
+        partner_ids = [pid for pid in partners.commercial_partner_id.ids if pid]
+        if not partner_ids:
+            return
+        self.env.cr.execute("""
+            UPDATE account_statement_credit_ledger
+               SET is_dirty = TRUE
+             WHERE partner_id = ANY(%s)
+               AND is_dirty IS NOT TRUE
+        """, [partner_ids])
+        self.invalidate_model(['is_dirty'])
+
+    @api.model
+    def _get_partner_balances(self, partners, banorte_rate):
+        """Saldo global en MXN por cliente comercial.
+
+        Lee el valor materializado y recalcula únicamente los clientes sin
+        fila, marcados como sucios o calculados con otro tipo de cambio.
+        Retorna {commercial_partner_id: balance_mxn}.
+        """
+        partners = partners.commercial_partner_id
+        if not partners:
+            return {}
+        self.env.cr.execute("""
+            SELECT partner_id, balance_mxn, rate, is_dirty
+              FROM account_statement_credit_ledger
+             WHERE partner_id = ANY(%s)
+        """, [partners.ids])
+        result = {}
+        for partner_id, balance_mxn, rate, is_dirty in self.env.cr.fetchall():
+            if not is_dirty and abs((rate or 0.0) - banorte_rate) < 1e-9:
+                result[partner_id] = balance_mxn or 0.0
+
+        stale = partners.filtered(lambda p: p.id not in result)
+        if stale:
+            fresh = self.env['sale.order']._statement_partner_balances_mxn(stale, banorte_rate)
+            self._store_balances(fresh, banorte_rate)
+            result.update(fresh)
+        return result
+
+    @api.model
+    def _store_balances(self, balances, banorte_rate):
+        """Persiste los saldos recalculados (upsert por cliente).
+
+        Se ejecuta en un savepoint: si el cursor es de solo lectura el valor
+        recalculado se usa igualmente, solo que no se materializa. Con el
+        contexto `statement_readonly` no se intenta escribir.
+        """
+        if not balances or self.env.context.get('statement_readonly'):
+            return
+        partner_ids = list(balances)
+        values = [balances[pid] for pid in partner_ids]
+        credits = [-value if value < -0.01 else 0.0 for value in values]
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    INSERT INTO account_statement_credit_ledger
+                           (partner_id, balance_mxn, credit_mxn, rate, is_dirty,
+                            create_uid, create_date, write_uid, write_date)
+                    SELECT row.partner_id, row.balance_mxn, row.credit_mxn, %(rate)s, FALSE,
+                           %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                      FROM unnest(%(partner_ids)s::int[], %(values)s::float8[], %(credits)s::float8[])
+                           AS row(partner_id, balance_mxn, credit_mxn)
+                    ON CONFLICT (partner_id) DO UPDATE
+                       SET balance_mxn = EXCLUDED.balance_mxn,
+                           credit_mxn = EXCLUDED.credit_mxn,
+                           rate = EXCLUDED.rate,
+                           is_dirty = FALSE,
+                           write_uid = EXCLUDED.write_uid,
+                           write_date = EXCLUDED.write_date
+                """, {
+                    'rate': banorte_rate,
+                    'uid': self.env.uid,
+                    'partner_ids': partner_ids,
+                    'values': values,
+                    'credits': credits,
+                })
+        except psycopg2.Error as exc:
+            _logger.debug('No se pudo materializar el saldo global de clientes %s: %s', partner_ids, exc)
+        self.invalidate_model()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+# Intentos antes de dar por fallido un job cuyo proceso murió a la mitad.
+JOB_MAX_ATTEMPTS = 2
+
+JOB_FILTER_FIELDS = (
+    'partner_id', 'project_id', 'date_from', 'date_to',
+    'include_draft', 'include_fully_paid', 'report_currency',
+)
+
+
+class AccountStatementJob(models.Model):
+    """Estado de cuenta generado en segundo plano.
+
+    Cuando el wizard estima un estado de cuenta demasiado grande para la
+    petición HTTP, crea un job con sus filtros; el cron lo renderiza, adjunta
+    el PDF al job y avisa al usuario por el bus. Mientras un job con los mismos
+    filtros y compañía está en cola o en proceso, o terminó hace menos de
+    `job_reuse_minutes`, no se crea otro: el usuario que lo vuelve a pedir se
+    agrega a `subscriber_ids` y recibe el mismo PDF.
+
+    Un job en proceso por más de `job_timeout_minutes` se considera muerto
+    (el worker excedió su límite de tiempo o memoria): se vuelve a encolar
+    una vez y después se marca con error.
+    """
+    _name = 'account.statement.job'
+    _description = 'Estado de Cuenta en Segundo Plano'
+    _order = 'id desc'
+
+    name = fields.Char(string='Descripción', required=True)
+    user_id = fields.Many2one('res.users', string='Solicitado por', required=True,
+                              default=lambda self: self.env.user, index=True)
+    subscriber_ids = fields.Many2many(
+        'res.users',
+        'account_statement_job_res_users_rel',
+        'job_id', 'user_id',
+        string='También Solicitado por',
+        readonly=True,
+    )
+    company_id = fields.Many2one('res.company', string='Compañía', required=True,
+                                 default=lambda self: self.env.company)
+    partner_id = fields.Many2one('res.partner', string='Cliente', required=True, ondelete='cascade')
+    project_id = fields.Many2one('project.project', string='Proyecto', ondelete='set null')
+    date_from = fields.Date(string='Desde')
+    date_to = fields.Date(string='Hasta')
+    include_draft = fields.Boolean(string='Incluir Cotizaciones (Borrador)')
+    include_fully_paid = fields.Boolean(string='Incluir Pagadas al 100%')
+    report_currency = fields.Selection([
+        ('mxn', 'Pesos Mexicanos (MXN)'),
+        ('usd', 'Dólares (USD)'),
+        ('both', 'Multi-moneda (USD + MXN)'),
+    ], string='Divisa del Reporte', required=True, default='mxn')
+    order_ids = fields.Many2many(
+        'sale.order',
+        'account_statement_job_sale_order_rel',
+        'job_id', 'order_id',
+        string='Órdenes Seleccionadas',
+    )
+    filter_key = fields.Char(string='Llave de Filtros', required=True, index=True, readonly=True)
+    estimated_orders = fields.Integer(string='Órdenes Estimadas', readonly=True)
+    estimated_lines = fields.Integer(string='Líneas Estimadas', readonly=True)
+
+    state = fields.Selection([
+        ('queued', 'En Cola'),
+        ('running', 'En Proceso'),
+        ('done', 'Terminado'),
+        ('failed', 'Error'),
+    ], string='Estado', default='queued', required=True, readonly=True, index=True)
+    attachment_id = fields.Many2one('ir.attachment', string='PDF', readonly=True, ondelete='set null')
+    message = fields.Char(string='Mensaje', readonly=True)
+    date_start = fields.Datetime(string='Inicio', readonly=True)
+    date_end = fields.Datetime(string='Fin', readonly=True)
+    duration = fields.Float(string='Duración (s)', digits=(12, 2), readonly=True)
+    attempt_count = fields.Integer(string='Intentos', readonly=True)
+
+    @api.model
+    def _stale_limit(self):
+        """Fecha de inicio antes de la cual un job en proceso se da por muerto."""
+        minutes = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.job_timeout_minutes', 60,
+        ))
+        return fields.Datetime.now() - timedelta(minutes=minutes)
+
+    @api.model
+    def _active_job_domain(self):
+        """Jobs en cola o en proceso que no se han quedado colgados."""
+        return [
+            '|',
+            ('state', '=', 'queued'),
+            '&', ('state', '=', 'running'), ('date_start', '>=', self._stale_limit()),
+        ]
+
+    @api.model
+    def _reuse_limit(self):
+        """Fecha de fin después de la cual el PDF de un job terminado se reutiliza."""
+        minutes = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.job_reuse_minutes', 30,
+        ))
+        return fields.Datetime.now() - timedelta(minutes=minutes)
+
+    @api.model
+    def _job_filter_key(self, vals):
+        """Huella de los filtros del job: compañía, filtros y órdenes."""
+        key = [vals.get('company_id')]
+        key += [str(vals.get(name) or '') for name in JOB_FILTER_FIELDS]
+        key.append(sorted(vals.get('order_ids') or []))
+        return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+    @api.model
+    def _enqueue_from_wizard(self, wizard, estimated_orders=0, estimated_lines=0):
+        """Encola el estado de cuenta del wizard o retorna el job equivalente.
+
+        Retorna (job, creado). Un job equivalente es uno activo o uno terminado
+        recientemente con PDF; el usuario actual se suscribe a él.
+        """
+        vals = {
+            'name': 'EDO %s' % (wizard.partner_id.name or ''),
+            'user_id': self.env.user.id,
+            'company_id': self.env.company.id,
+            'partner_id': wizard.partner_id.id,
+            'project_id': wizard.project_id.id,
+            'date_from': wizard.date_from,
+            'date_to': wizard.date_to,
+            'include_draft': wizard.include_draft,
+            'include_fully_paid': wizard.include_fully_paid,
+            'report_currency': wizard.report_currency,
+            'order_ids': wizard.order_ids.ids,
+            'estimated_orders': estimated_orders,
+            'estimated_lines': estimated_lines,
+        }
+        vals['filter_key'] = self._job_filter_key(vals)
+        Job = self.sudo()
+        job = Job.search([('filter_key', '=', vals['filter_key'])] + self._active_job_domain(), limit=1)
+        if not job:
+            job = Job.search([
+                ('filter_key', '=', vals['filter_key']),
+                ('state', '=', 'done'),
+                ('attachment_id', '!=', False),
+                ('date_end', '>=', self._reuse_limit()),
+            ], order='date_end desc', limit=1)
+        if job:
+            if job.user_id != self.env.user:
+                job.subscriber_ids = [fields.Command.link(self.env.user.id)]
+            return job.with_env(self.env), False
+        vals['order_ids'] = [fields.Command.set(vals['order_ids'])]
+        job = self.sudo().create(vals)
+        self.env.ref('account_statement_report.ir_cron_account_statement_job')._trigger()
+        return job, True
+
+    @api.model
+    def _cron_process_jobs(self):
+        self._recover_stale_jobs()
+        for job in self.search([('state', '=', 'queued')], order='id'):
+            job._process()
+
+    @api.model
+    def _recover_stale_jobs(self):
+        """Reencola (o marca con error) los jobs cuyo proceso murió."""
+        stale = self.search([('state', '=', 'running'), ('date_start', '<', self._stale_limit())])
+        if not stale:
+            return
+        retry = stale.filtered(lambda job: job.attempt_count < JOB_MAX_ATTEMPTS)
+        failed = stale - retry
+        retry.write({'state': 'queued', 'date_start': False})
+        failed.write({
+            'state': 'failed',
+            'date_end': fields.Datetime.now(),
+            'message': 'El estado de cuenta excedió el tiempo de generación.',
+        })
+        failed._notify_user()
+        _logger.warning(
+            "Jobs de estado de cuenta colgados: %s reencolados, %s con error",
+            len(retry), len(failed),
+        )
+        self.env.cr.commit()
+
+    def _process(self):
+        """Renderiza el PDF del job como el usuario que lo solicitó."""
+        self.ensure_one()
+        self.write({
+            'state': 'running',
+            'date_start': fields.Datetime.now(),
+            'date_end': False,
+            'attempt_count': self.attempt_count + 1,
+        })
+        self.env.cr.commit()
+
+        start = time.perf_counter()
+        job = self.with_user(self.user_id).with_company(self.company_id)
+        vals = {}
+        try:
+            with self.env.cr.savepoint():
+                pdf_content, filename = job._render_pdf()
+                attachment = self.env['ir.attachment'].create({
+                    'name': filename,
+                    'type': 'binary',
+                    'raw': pdf_content,
+                    'res_model': self._name,
+                    'res_id': self.id,
+                    'mimetype': 'application/pdf',
+                })
+            vals = {'state': 'done', 'attachment_id': attachment.id, 'message': False}
+        except UserError as exc:
+            vals = {'state': 'failed', 'message': str(exc)}
+        except Exception as exc:
+            _logger.exception("Error generando estado de cuenta en segundo plano (job %s)", self.id)
+            vals = {'state': 'failed', 'message': str(exc)[:250]}
+        vals.update({
+            'date_end': fields.Datetime.now(),
+            'duration': time.perf_counter() - start,
+        })
+        self.write(vals)
+        self._notify_user()
+        self.env.cr.commit()
+
+    def _render_pdf(self):
+        self.ensure_one()
+        wizard = self.env['account.statement.wizard'].create({
+            'partner_id': self.partner_id.id,
+            'project_id': self.project_id.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'include_draft': self.include_draft,
+            'include_fully_paid': self.include_fully_paid,
+            'report_currency': self.report_currency,
+            'order_ids': [fields.Command.set(self.order_ids.ids)],
+        })
+        return wizard._render_statement_pdf()
+
+    def _notify_user(self):
+        """Avisa al usuario que solicitó el job que ya terminó."""
+        for job in self:
+            if job.state == 'done':
+                notification = {
+                    'type': 'success',
+                    'title': 'Estado de Cuenta listo',
+                    'message': '%s: el PDF está disponible en "Estados de Cuenta en Segundo Plano".' % job.partner_id.name,
+                    'sticky': True,
+                }
+            else:
+                notification = {
+                    'type': 'danger',
+                    'title': 'Estado de Cuenta con error',
+                    'message': '%s: %s' % (job.partner_id.name, job.message or ''),
+                    'sticky': True,
+                }
+            for user in job.user_id | job.subscriber_ids:
+                user.partner_id._bus_send('simple_notification', notification)
+
+    def action_download(self):
+        self.ensure_one()
+        if not self.attachment_id:
+            raise UserError("El estado de cuenta aún no está disponible.")
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % self.attachment_id.id,
+            'target': 'self',
+        }
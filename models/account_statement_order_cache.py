@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import base64
+import collections
+import json
+import logging
+import threading
+import time
+import zlib
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# Contadores del proceso (aciertos / fallos de caché) y aciertos por entrada
+# aún no escritos en la base.
+_STATS_LOCK = threading.Lock()
+_STATS = {'hits': 0, 'misses': 0}
+_PENDING_HITS = collections.Counter()
+_LAST_HITS_FLUSH = {'time': time.monotonic()}
+
+# Segundos entre escrituras de aciertos (hit_count / last_used).
+HITS_FLUSH_INTERVAL = 60
+
+
+class AccountStatementOrderCache(models.Model):
+    """Datos de estado de cuenta por orden, memorizados por huella.
+
+    La huella (`sale.order._statement_fingerprints`) cambia cuando cambia la
+    orden, sus líneas, facturas publicadas, pagos conciliados, documentos SOM
+    o el tipo de cambio. Mientras no cambie, la orden se sirve desde aquí. El
+    autovacuum conserva solo las entradas usadas más recientemente.
+
+    Los aciertos se acumulan en memoria del proceso y se escriben a lo más
+    una vez por minuto en un cursor aparte, sin bloquear filas en la
+    transacción de la impresión.
+    """
+    _name = 'account.statement.order.cache'
+    _description = 'Caché de Estado de Cuenta por Orden'
+    _rec_name = 'order_id'
+
+    order_id = fields.Many2one('sale.order', string='Orden', required=True, ondelete='cascade')
+    fingerprint = fields.Char(string='Huella', required=True)
+    payload = fields.Binary(string='Datos (comprimidos)', attachment=False, readonly=True)
+    payload_size = fields.Integer(string='Tamaño sin comprimir (bytes)', readonly=True)
+    hit_count = fields.Integer(string='Aciertos', readonly=True)
+    last_used = fields.Datetime(string='Último Uso', readonly=True, index=True)
+
+    _order_uniq = models.Constraint(
+        'UNIQUE(order_id)',
+        'Solo puede existir una entrada de caché por orden.',
+    )
+
+    @api.model
+    def _lookup(self, fingerprints):
+        """Datos memorizados cuya huella coincide.
+
+        Retorna {order_id: dict}.
+        """
+        if not fingerprints:
+            return {}
+        order_ids = list(fingerprints)
+        self.env.cr.execute("""
+            SELECT id, order_id, fingerprint, payload
+              FROM account_statement_order_cache
+             WHERE order_id = ANY(%s)
+        """, [order_ids])
+        result = {}
+        hit_ids = []
+        for cache_id, order_id, fingerprint, payload in self.env.cr.fetchall():
+            if fingerprint != fingerprints[order_id] or not payload:
+                continue
+            result[order_id] = json.loads(zlib.decompress(base64.b64decode(bytes(payload))))
+            hit_ids.append(cache_id)
+
+        with _STATS_LOCK:
+            _STATS['hits'] += len(result)
+            _STATS['misses'] += len(order_ids) - len(result)
+            _PENDING_HITS.update(hit_ids)
+            flush_due = time.monotonic() - _LAST_HITS_FLUSH['time'] >= HITS_FLUSH_INTERVAL
+
+        # Con `statement_readonly` los aciertos quedan en memoria hasta la
+        # siguiente impresión normal o el autovacuum.
+        if flush_due and not self.env.context.get('statement_readonly'):
+            self._flush_hits()
+        return result
+
+    @api.model
+    def _flush_hits(self):
+        """Escribe los aciertos acumulados en un cursor propio.
+
+        Las filas bloqueadas por otra transacción se omiten (SKIP LOCKED): su
+        conteo se pierde, solo alimenta el orden LRU.
+        """
+        with _STATS_LOCK:
+            hits = dict(_PENDING_HITS)
+            _PENDING_HITS.clear()
+            _LAST_HITS_FLUSH['time'] = time.monotonic()
+        if not hits:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                cr.execute("""
+                    UPDATE account_statement_order_cache cache
+                       SET hit_count = cache.hit_count + hits.count,
+                           last_used = NOW() AT TIME ZONE 'UTC'
+                      FROM unnest(%s::int[], %s::int[]) AS hits(id, count)
+                     WHERE cache.id = hits.id
+                       AND cache.id IN (
+                            SELECT id
+                              FROM account_statement_order_cache
+                             WHERE id = ANY(%s)
+                               FOR UPDATE SKIP LOCKED
+                       )
+                """, [list(hits), list(hits.values()), list(hits)])
+        except psycopg2.Error as exc:
+            _logger.debug('No se pudieron guardar los aciertos de caché: %s', exc)
+
+    @api.model
+    def _store(self, entries):
+        """Guarda {order_id: (fingerprint, dict)} (upsert por orden)."""
+        if not entries:
+            return
+        order_ids, fingerprints, payloads, sizes = [], [], [], []
+        for order_id, (fingerprint, data) in entries.items():
+            raw = json.dumps(data, default=str, separators=(',', ':')).encode()
+            order_ids.append(order_id)
+            fingerprints.append(fingerprint)
+            payloads.append(psycopg2.Binary(base64.b64encode(zlib.compress(raw))))
+            sizes.append(len(raw))
+        self._execute_best_effort("""
+            INSERT INTO account_statement_order_cache
+                   (order_id, fingerprint, payload, payload_size, hit_count, last_used,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT row.order_id, row.fingerprint, row.payload, row.payload_size, 0,
+                   NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC',
+                   %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%(order_ids)s::int[], %(fingerprints)s::varchar[],
+                          %(payloads)s::bytea[], %(sizes)s::int[])
+                   AS row(order_id, fingerprint, payload, payload_size)
+            ON CONFLICT (order_id) DO UPDATE
+               SET fingerprint = EXCLUDED.fingerprint,
+                   payload = EXCLUDED.payload,
+                   payload_size = EXCLUDED.payload_size,
+                   last_used = EXCLUDED.last_used,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'uid': self.env.uid,
+            'order_ids': order_ids,
+            'fingerprints': fingerprints,
+            'payloads': payloads,
+            'sizes': sizes,
+        })
+
+    @api.model
+    def _execute_best_effort(self, query, params):
+        """Ejecuta una escritura de caché sin romper lecturas de solo lectura."""
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(query, params)
+        except psycopg2.Error as exc:
+            _logger.debug('No se pudo actualizar la caché de estado de cuenta: %s', exc)
+        self.invalidate_model()
+
+    @api.model
+    def _get_stats(self):
+        """Aciertos y fallos de caché de este proceso."""
+        with _STATS_LOCK:
+            stats = dict(_STATS)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    @api.autovacuum
+    def _gc_least_recently_used(self):
+        """Conserva solo las entradas usadas más recientemente (LRU)."""
+        self._flush_hits()
+        max_entries = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.order_cache_size', 20000,
+        ))
+        self.env.cr.execute("""
+            DELETE FROM account_statement_order_cache
+             WHERE id IN (
+                    SELECT id
+                      FROM account_statement_order_cache
+                     ORDER BY last_used DESC NULLS LAST, id DESC
+                    OFFSET %s
+             )
+        """, [max(max_entries, 0)])
+        _logger.info('Caché de estado de cuenta: %s entradas expulsadas', self.env.cr.rowcount)
@@ -1,10 +1,23 @@
 # -*- coding: utf-8 -*-
 from odoo import models, api
+from odoo.exceptions import UserError
 import logging
 
+from .statement_profiler import profile_phase
+from .statement_lines import statement_lines
+from .statement_rates import StatementRateTable
+
 _logger = logging.getLogger(__name__)
 
 
+def _money(value):
+    return '{:,.2f}'.format(value or 0.0)
+
+
+def _qty(value):
+    return '%.2f' % (value or 0.0)
+
+
 class AccountStatementReportParser(models.AbstractModel):
     _name = 'report.account_statement_report.account_statement'
     _description = 'Parser para Estado de Cuenta'
@@ -17,18 +30,42 @@ class AccountStatementReportParser(models.AbstractModel):
         report_data = data.get('data', data)
 
         wizard_id = report_data.get('wizard_id')
+        order_id = report_data.get('order_id')
         if wizard_id:
             wizard = self.env['account.statement.wizard'].browse(wizard_id)
+        elif order_id:
+            # Estado de cuenta directo de una orden: no hay wizard.
+            wizard = self.env['account.statement.wizard']
         else:
             wizard = self.env['account.statement.wizard'].browse(docids)
 
+        chunk = report_data.get('statement_chunk')
+        if 'orders_data' not in report_data:
+            report_data = self._load_statement_data(report_data, wizard)
+
+        orders_data = report_data.get('orders_data', [])
+        if chunk:
+            orders_data = orders_data[chunk['start']:chunk['stop']]
+
+        report_currency = report_data.get('report_currency', 'mxn')
+        banorte_rate = report_data.get('banorte_rate', 0) or 0.0
+        rates = StatementRateTable.from_dict(report_data.get('currency_rates'), banorte_rate)
+
+        if order_id and not wizard_id:
+            docs = self.env['sale.order'].browse(order_id)
+            doc_ids, doc_model = docs.ids, 'sale.order'
+        else:
+            docs = wizard
+            doc_ids, doc_model = [wizard_id] if wizard_id else docids, 'account.statement.wizard'
+
         values = {
-            'doc_ids': [wizard_id] if wizard_id else docids,
-            'doc_model': 'account.statement.wizard',
-            'docs': wizard,
+            'doc_ids': doc_ids,
+            'doc_model': doc_model,
+            'docs': docs,
             'data': report_data,
             'banorte_rate': report_data.get('banorte_rate', 0),
-            'orders_data': report_data.get('orders_data', []),
+            'orders_data': orders_data,
+            'show_final_summary': not chunk or chunk.get('last', True),
             'partner_name': report_data.get('partner_name', ''),
             'partner_vat': report_data.get('partner_vat', ''),
             'project_name': report_data.get('project_name', ''),
@@ -47,9 +84,194 @@ class AccountStatementReportParser(models.AbstractModel):
             'customer_credit_usd': report_data.get('customer_credit_usd', 0),
             'has_customer_credit': report_data.get('has_customer_credit', False),
         }
-        _logger.info(
+        with profile_phase(self.env, 'view_model') as phase:
+            values['view_orders'] = [
+                self._build_order_view(od, report_currency, rates)
+                for od in orders_data
+            ]
+            values['summary'] = self._build_summary_view(values)
+            phase['rows'] = len(orders_data)
+        _logger.debug(
             "PARSER: orders=%s, partner=%s, report_currency=%s, usd=%s, mxn=%s",
             len(values['orders_data']), values['partner_name'],
             values['report_currency'], values['orders_usd_count'], values['orders_mxn_count'],
         )
-        return values
\ No newline at end of file
+        return values
+
+    @api.model
+    def _load_statement_data(self, report_data, wizard):
+        """Carga los datos desde el snapshot del servidor.
+
+        Si el snapshot ya expiró, los reconstruye desde el wizard. Una
+        referencia directa a una orden (`order_id`) se arma desde la orden.
+        Si ya no queda de dónde armarlos (p. ej. snapshot y wizard limpiados
+        por el autovacuum), lanza UserError.
+        """
+        if report_data.get('order_id') and not report_data.get('wizard_id'):
+            order = self.env['sale.order'].browse(report_data['order_id']).exists()
+            if not order:
+                raise UserError("La orden de este estado de cuenta ya no existe.")
+            return order._prepare_order_statement_data(report_data.get('report_currency', 'mxn'))
+        snapshot = self.env['account.statement.snapshot'].browse(
+            report_data.get('snapshot_id')
+        ).exists()
+        if snapshot:
+            return snapshot._load_data()
+        wizard = wizard.exists()
+        if not wizard:
+            raise UserError(
+                "Los datos de este estado de cuenta ya expiraron. "
+                "Vuelva a generar el estado de cuenta desde el asistente."
+            )
+        _logger.info("PARSER: snapshot %s expirado, reconstruyendo desde wizard %s",
+                     report_data.get('snapshot_id'), wizard.id)
+        return wizard._prepare_statement_data()
+
+    @api.model
+    def _resolve_statement_data(self, data, docids=None):
+        """Datos completos (con `orders_data`) del estado de cuenta de `data`."""
+        report_data = data.get('data', data)
+        if 'orders_data' in report_data:
+            return report_data
+        wizard = self.env['account.statement.wizard'].browse(report_data.get('wizard_id') or docids)
+        return self._load_statement_data(report_data, wizard)
+
+    @api.model
+    def _statement_company(self, report_data):
+        """Compañía del estado de cuenta (la de sus órdenes), o la activa.
+
+        Es la que usa el layout externo al renderizar y la que entra a la
+        llave de la caché de PDF.
+        """
+        company = self.env['res.company'].browse(report_data.get('company_id')).exists()
+        return company or self.env.company
+
+    @api.model
+    def _count_statement_orders(self, data, docids=None):
+        """Número de órdenes del estado de cuenta referenciado por `data`."""
+        report_data = data.get('data', data)
+        if 'orders_data' in report_data:
+            return len(report_data['orders_data'])
+        if report_data.get('order_id') and not report_data.get('wizard_id'):
+            return 1
+        return len(self._resolve_statement_data(data, docids).get('orders_data', []))
+
+    # ═══════════════════════════════════════════════════════════════════
+    # Modelo de vista: valores ya resueltos y formateados para QWeb
+    # ═══════════════════════════════════════════════════════════════════
+
+    @api.model
+    def _build_order_view(self, od, report_currency, rates):
+        """Columnas de presentación de UNA orden para la divisa del reporte.
+
+        La plantilla solo itera e imprime: conversiones (con la tabla de tipos
+        de cambio del estado de cuenta), selección de columna y formato
+        numérico se resuelven aquí una sola vez.
+        """
+        currency = od.get('currency', '')
+        both = report_currency == 'both'
+        display_currency = currency if both else ('MXN' if report_currency == 'mxn' else 'USD')
+
+        # Un solo factor para todas las columnas de la orden; sin tipo de
+        # cambio hacia la divisa del reporte, los montos van en cero.
+        factor = rates.factor(currency, display_currency) or 0.0
+
+        def display(amount):
+            return (amount or 0.0) * factor
+
+        material_rows = []
+        for seq, ml in enumerate(statement_lines(od.get('material_lines')), start=1):
+            pct = ml.pct_delivered or 0.0
+            material_rows.append({
+                'seq': seq,
+                'product_name': ml.product_name,
+                'qty_ordered': _qty(ml.qty_ordered),
+                'uom': ml.uom or 'm²',
+                'qty_delivered': _qty(ml.qty_delivered),
+                'qty_returned': _qty(ml.qty_returned),
+                'qty_pending': _qty(ml.qty_pending),
+                'pct': '%.0f' % pct,
+                'pct_color': '#28a745' if pct >= 100 else '#ffc107' if pct >= 50 else '#dc3545',
+                'price_unit': _money(display(ml.price_unit)),
+                'price_unit_alt': _money(ml.price_unit_alt),
+                'total': _money(display(ml.subtotal)),
+                'total_alt': _money(ml.subtotal_alt),
+            })
+
+        service_rows = [{
+            'product_name': sl.product_name,
+            'qty_ordered': _qty(sl.qty_ordered),
+            'price_unit': _money(display(sl.price_unit)),
+            'total': _money(display(sl.subtotal)),
+        } for sl in statement_lines(od.get('service_lines'))]
+
+        return_rows = [{
+            'return_name': ret.get('return_name', ''),
+            'return_date': ret.get('return_date', ''),
+            'return_reason': ret.get('return_reason', '') or '-',
+            'return_action': ret.get('return_action', '') or '-',
+            'origin_remission': ret.get('origin_remission', '') or '-',
+            'product_name': ret.get('product_name', ''),
+            'lot_name': ret.get('lot_name', ''),
+            'qty_returned': _qty(ret.get('qty_returned', 0)),
+            'uom': ret.get('uom', ''),
+        } for ret in od.get('return_lines', [])]
+
+        payment_rows = [{
+            'name': pmt.get('name', ''),
+            'date': pmt.get('date', ''),
+            'currency': pmt.get('currency', ''),
+            'amount': _money(pmt.get('amount', 0)),
+        } for pmt in od.get('payments', [])]
+
+        untaxed = display(od.get('amount_untaxed', 0))
+        tax = display(od.get('amount_tax', 0))
+        total = display(od.get('amount_total', 0))
+        # El pagado sin tipo de cambio se muestra sin convertir.
+        paid = rates.convert(od.get('total_paid', 0), currency, display_currency)
+
+        balance = od.get('balance', 0)
+        has_balance = balance > 0.01
+        has_credit = balance < -0.01
+
+        return {
+            'order_name': od.get('order_name', ''),
+            'order_date': od.get('order_date', ''),
+            'seller_name': od.get('seller_name', ''),
+            'currency': currency,
+            'display_currency': display_currency,
+            'show_alt': both,
+            'alt_currency': od.get('currency_alt', '') if both and material_rows else '',
+            'material_rows': material_rows,
+            'service_rows': service_rows,
+            'return_rows': return_rows,
+            'return_documents_count': od.get('return_documents_count', 0),
+            'total_returned_qty': _qty(od.get('total_returned_qty', 0)),
+            'payment_rows': payment_rows,
+            'untaxed': _money(untaxed),
+            'tax': _money(tax),
+            'total': _money(total),
+            'total_paid': _money(paid),
+            'balance_label': 'Saldo a Favor' if has_credit else 'Saldo Pendiente',
+            'balance_color': '#28a745' if has_credit else ('#c00' if has_balance else '#999'),
+            'balance_bg': '#f0fdf4' if has_credit else ('#fff5f5' if has_balance else '#f5f5f5'),
+            'balance_mxn': _money(abs(od.get('balance_mxn', 0))),
+            'balance_usd': _money(abs(od.get('balance_usd', 0))),
+        }
+
+    @api.model
+    def _build_summary_view(self, values):
+        """Valores ya formateados del Resumen Final y del saldo a favor."""
+        net_mxn_credit = values['total_balance_mxn'] < -0.01
+        net_usd_credit = values['total_balance_usd'] < -0.01
+        return {
+            'net_mxn_credit': net_mxn_credit,
+            'net_usd_credit': net_usd_credit,
+            'net_mxn_color': '#28a745' if net_mxn_credit else '#c00',
+            'net_usd_color': '#28a745' if net_usd_credit else '#c00',
+            'total_balance_mxn': _money(abs(values['total_balance_mxn'])),
+            'total_balance_usd': _money(abs(values['total_balance_usd'])),
+            'banorte_rate': '%.4f' % (values['banorte_rate'] or 0.0),
+            'customer_credit_mxn': _money(values['customer_credit_mxn']),
+            'customer_credit_usd': _money(values['customer_credit_usd']),
+        }
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+MODULE = 'account_statement_report'
+
+# Llaves de los datos del reporte que no cambian el PDF (referencias y
+# bloques de render).
+VOLATILE_KEYS = ('wizard_id', 'snapshot_id', 'run_id', 'order_id', 'statement_chunk')
+
+# Plantillas externas que llama el reporte (además del layout de la compañía).
+LAYOUT_TEMPLATES = (
+    'web.html_container',
+    'web.report_layout',
+    'web.external_layout',
+    'stock_lot_dimensions.som_report_style',
+)
+
+
+class AccountStatementPdfCache(models.Model):
+    """PDF de estado de cuenta ya renderizado, direccionado por contenido.
+
+    La llave es un hash de los datos normalizados del estado de cuenta, la
+    divisa del reporte, las plantillas, el layout de la compañía y el formato
+    de papel: una reimpresión con los mismos datos se sirve desde el adjunto
+    sin pasar por wkhtmltopdf.
+    El autovacuum expulsa por antigüedad y por tamaño total; el contexto
+    `statement_pdf_cache_bypass` lo omite.
+    """
+    _name = 'account.statement.pdf.cache'
+    _description = 'Caché de PDF de Estado de Cuenta'
+    _rec_name = 'key'
+    _order = 'last_used desc'
+
+    key = fields.Char(string='Llave', required=True, readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string='PDF', required=True,
+                                    ondelete='cascade', readonly=True)
+    report_currency = fields.Char(string='Divisa del Reporte', readonly=True)
+    file_size = fields.Integer(string='Tamaño (bytes)', readonly=True)
+    hit_count = fields.Integer(string='Aciertos', readonly=True)
+    last_used = fields.Datetime(string='Último Uso', readonly=True, index=True)
+
+    _key_uniq = models.Constraint(
+        'UNIQUE(key)',
+        'Solo puede existir un PDF por llave.',
+    )
+
+    @api.model
+    def _template_version(self, report=None, company=None):
+        """Todo lo que entra al PDF además de los datos del estado de cuenta.
+
+        Versión del módulo y última modificación de sus plantillas QWeb, de
+        las que llaman (contenedor, layout externo de la compañía, estilo SOM)
+        y de sus herencias; la compañía y su contacto (logo, colores, textos
+        de encabezado y pie) y el formato de papel del reporte. `company` es
+        la del estado de cuenta (ver `_statement_company` del parser).
+        """
+        company = company or self.env.company
+        layout = company.external_report_layout_id
+        paperformat = (report and report.paperformat_id) or company.paperformat_id
+        self.env.cr.execute("""
+            WITH layout_views AS (
+                SELECT id, write_date
+                  FROM ir_ui_view
+                 WHERE type = 'qweb'
+                   AND (key LIKE %(module_views)s
+                        OR key LIKE 'web.external_layout%%'
+                        OR key = ANY(%(templates)s)
+                        OR id = %(layout_id)s)
+            )
+            SELECT (SELECT latest_version FROM ir_module_module WHERE name = %(module)s),
+                   (SELECT max(write_date)
+                      FROM (SELECT write_date FROM layout_views
+                            UNION ALL
+                            SELECT write_date FROM ir_ui_view
+                             WHERE inherit_id IN (SELECT id FROM layout_views)) views)
+        """, {
+            'module': MODULE,
+            'module_views': MODULE + '.%',
+            'templates': list(LAYOUT_TEMPLATES),
+            'layout_id': layout.id or None,
+        })
+        module_version, views_date = self.env.cr.fetchone()
+        return [
+            module_version,
+            views_date,
+            company.id,
+            company.write_date,
+            company.partner_id.write_date,
+            layout.id,
+            paperformat.id,
+            paperformat.write_date,
+        ]
+
+    @api.model
+    def _make_key(self, report_data, report=None, company=None):
+        """Llave del PDF para los datos completos del estado de cuenta."""
+        normalized = {k: v for k, v in report_data.items() if k not in VOLATILE_KEYS}
+        raw = json.dumps(
+            [normalized, report_data.get('report_currency'), self._template_version(report, company)],
+            sort_keys=True, default=str, separators=(',', ':'),
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @api.model
+    def _lookup(self, key):
+        """Contenido del PDF en caché para `key`, o None."""
+        entry = self.search([('key', '=', key)], limit=1)
+        if not entry or not entry.attachment_id:
+            return None
+        pdf_content = entry.attachment_id.raw
+        if not pdf_content:
+            return None
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    UPDATE account_statement_pdf_cache
+                       SET hit_count = hit_count + 1,
+                           last_used = NOW() AT TIME ZONE 'UTC'
+                     WHERE id = %s
+                """, [entry.id])
+        except psycopg2.Error as exc:
+            _logger.debug('No se pudo actualizar la caché de PDF: %s', exc)
+        return pdf_content
+
+    @api.model
+    def _store(self, key, pdf_content, report_currency=None):
+        """Guarda el PDF como adjunto. Sin efecto en cursores de solo lectura."""
+        if not pdf_content:
+            return
+        try:
+            with self.env.cr.savepoint():
+                if self.search_count([('key', '=', key)], limit=1):
+                    return
+                attachment = self.env['ir.attachment'].create({
+                    'name': 'estado_de_cuenta_%s.pdf' % key[:16],
+                    'type': 'binary',
+                    'raw': pdf_content,
+                    'mimetype': 'application/pdf',
+                    'res_model': self._name,
+                })
+                entry = self.create({
+                    'key': key,
+                    'attachment_id': attachment.id,
+                    'report_currency': report_currency,
+                    'file_size': len(pdf_content),
+                    'last_used': fields.Datetime.now(),
+                })
+                attachment.res_id = entry.id
+        except psycopg2.Error as exc:
+            _logger.debug('No se pudo guardar el PDF en caché: %s', exc)
+
+    @api.autovacuum
+    def _gc_pdf_cache(self):
+        """Expulsa PDFs sin uso reciente y, después, los menos usados por tamaño."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_age_days = int(ICP.get_param('account_statement_report.pdf_cache_max_age_days', 7))
+        max_bytes = int(ICP.get_param('account_statement_report.pdf_cache_max_mb', 500)) * 1024 * 1024
+
+        expired = self.search([
+            ('last_used', '<', fields.Datetime.now() - timedelta(days=max_age_days)),
+        ])
+        self.env.cr.execute("""
+            SELECT id
+              FROM (
+                    SELECT id, SUM(file_size) OVER (ORDER BY last_used DESC NULLS LAST, id DESC) AS used
+                      FROM account_statement_pdf_cache
+                   ) entries
+             WHERE used > %s
+        """, [max(max_bytes, 0)])
+        oversized = self.browse(row[0] for row in self.env.cr.fetchall())
+        evicted = expired | oversized
+        evicted.attachment_id.unlink()
+        evicted.exists().unlink()
+        _logger.info('Caché de PDF de estado de cuenta: %s PDFs expulsados', len(evicted))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+import logging
+
+from .statement_workers import split_chunks
+
+_logger = logging.getLogger(__name__)
+
+# Monedas con tipo propio del estado de cuenta: MXN es la base y USD usa el
+# tipo Banorte; el resto usa la tasa de la compañía.
+BANORTE_CURRENCIES = ('MXN', 'USD')
+
+
+class AccountStatementRateProvider(models.AbstractModel):
+    """Tipo de cambio Banorte compartido por wizard, reporte y orden de venta.
+
+    El valor se guarda en caché por compañía y fecha. Al escribir
+    `banorte.last_rate` o al crear, modificar o borrar tasas de moneda se
+    compara el tipo vigente antes y después; solo si cambió se limpia la caché
+    y se encola el recálculo de los saldos materializados en USD. Las tasas
+    de otras monedas (EUR, ...) encolan solo las órdenes de esa moneda.
+    """
+    _name = 'account.statement.rate.provider'
+    _description = 'Proveedor de Tipo de Cambio para Estado de Cuenta'
+
+    @api.model
+    def _get_banorte_rate(self, company=None, date=None):
+        """Tipo de cambio MXN/USD vigente para la compañía y fecha dadas."""
+        company = company or self.env.company
+        date = date or fields.Date.today()
+        return self._get_banorte_rate_cached(company.id, fields.Date.to_string(date))
+
+    @tools.ormcache('company_id', 'date_str')
+    def _get_banorte_rate_cached(self, company_id, date_str):
+        return self._compute_banorte_rate(company_id, date_str)
+
+    @api.model
+    def _compute_banorte_rate(self, company_id, date_str):
+        """Tipo Banorte sin caché: el parámetro o, sin él, la tasa USD/MXN."""
+        rate_param = self.env['ir.config_parameter'].sudo().get_param('banorte.last_rate', '0')
+        try:
+            rate = float(rate_param)
+        except (ValueError, TypeError):
+            rate = 0.0
+
+        if rate <= 0:
+            company = self.env['res.company'].sudo().browse(company_id)
+            date = fields.Date.to_date(date_str)
+            usd = self.env.ref('base.USD', raise_if_not_found=False)
+            company_currency = company.currency_id
+            if usd and company_currency and company_currency.name == 'MXN':
+                rate = usd.sudo()._convert(1.0, company_currency, company, date)
+            elif usd and company_currency and company_currency.name == 'USD':
+                mxn = self.env.ref('base.MXN', raise_if_not_found=False)
+                if mxn:
+                    rate = mxn.sudo()._convert(1.0, usd, company, date)
+                    rate = 1 / rate if rate > 0 else 0
+        return rate
+
+    @api.model
+    def _get_company_rates(self, cached=True):
+        """Tipo Banorte de hoy por compañía: {company_id: rate}."""
+        date_str = fields.Date.to_string(fields.Date.today())
+        companies = self.env['res.company'].sudo().search([])
+        if cached:
+            return {company.id: self._get_banorte_rate_cached(company.id, date_str) for company in companies}
+        return {company.id: self._compute_banorte_rate(company.id, date_str) for company in companies}
+
+    @api.model
+    def _clear_rate_cache(self):
+        self.env.registry.clear_cache()
+
+    @api.model
+    def _rate_changed(self, previous_rates, currency_names=()):
+        """Reacciona a un posible cambio de tipo de cambio.
+
+        `previous_rates` es `_get_company_rates()` tomado antes de escribir y
+        `currency_names` las monedas de las tasas escritas. Con tipo Banorte
+        configurado, las tasas USD/MXN no lo afectan y se ignoran.
+        """
+        current_rates = self._get_company_rates(cached=False)
+        banorte_changed = any(
+            abs(previous_rates.get(company_id, 0.0) - rate) > 1e-9
+            for company_id, rate in current_rates.items()
+        )
+        names = {name for name in currency_names if name and name not in BANORTE_CURRENCIES}
+        if 'MXN' in currency_names and self.env['res.company'].sudo().search_count(
+            [('currency_id.name', '!=', 'MXN')], limit=1,
+        ):
+            # En compañías que no son MXN la tasa MXN es la base de todas las
+            # demás monedas.
+            names = None
+        if banorte_changed:
+            self._clear_rate_cache()
+            if names is not None:
+                names.add('USD')
+        if names is None or names:
+            self.env['account.statement.rate.recompute'].sudo()._enqueue(names)
+        return banorte_changed
+
+
+class AccountStatementRateRecompute(models.Model):
+    """Monedas con tipo de cambio modificado, pendientes de recalcular.
+
+    El cambio de tasa solo encola la moneda; el cron recalcula por bloques
+    los saldos materializados de las órdenes que dependen de ella, fuera de
+    la transacción que escribió la tasa.
+    """
+    _name = 'account.statement.rate.recompute'
+    _description = 'Recálculo Pendiente de Saldos por Tipo de Cambio'
+    _rec_name = 'currency_name'
+
+    currency_name = fields.Char(string='Moneda', help='Vacío: todas las monedas.')
+
+    @api.model
+    def _enqueue(self, currency_names=None):
+        """Encola las monedas (None = todas) y dispara el cron."""
+        names = [False] if currency_names is None else sorted(currency_names)
+        self.create([{'currency_name': name} for name in names])
+        self.env.ref('account_statement_report.ir_cron_account_statement_rate_recompute')._trigger()
+
+    @api.model
+    def _cron_recompute(self):
+        pending = self.search([])
+        if not pending:
+            return
+        names = None if not all(pending.mapped('currency_name')) else set(pending.mapped('currency_name'))
+        SaleOrder = self.env['sale.order'].sudo()
+        order_ids = SaleOrder._statement_rate_dependent_order_ids(names)
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.rate_recompute_batch_size', 500,
+        ))
+        fields_to_compute = self.pool.field_computed[SaleOrder._fields['x_statement_balance']]
+        for chunk_ids in split_chunks(order_ids, batch_size):
+            orders = SaleOrder.browse(chunk_ids)
+            for field in fields_to_compute:
+                self.env.add_to_compute(field, orders)
+            orders._statement_invalidate_credit()
+            self.env.flush_all()
+            self.env.cr.commit()
+            self.env.invalidate_all()
+        pending.unlink()
+        _logger.info(
+            "Saldos por tipo de cambio recalculados: %s órdenes (monedas: %s)",
+            len(order_ids), ', '.join(sorted(names)) if names is not None else 'todas',
+        )
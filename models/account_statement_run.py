@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountStatementRun(models.Model):
+    """Registro por generación de estado de cuenta (fases, tiempos, consultas).
+
+    Lo llena `StatementProfiler`: la preparación de datos al imprimir y el
+    render (QWeb + wkhtmltopdf) completan la misma corrida. El autovacuum
+    borra las corridas más antiguas que `run_retention_days`.
+    """
+    _name = 'account.statement.run'
+    _description = 'Corrida de Estado de Cuenta'
+    _order = 'id desc'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one('res.partner', string='Cliente', ondelete='set null', index=True)
+    user_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user)
+    orders_count = fields.Integer(string='Órdenes')
+    lines_count = fields.Integer(string='Líneas')
+    payload_size = fields.Integer(string='Tamaño de Datos (bytes)')
+    exchange_rate = fields.Float(
+        string='Tipo de Cambio Aplicado', digits=(12, 4), aggregator=False,
+        help='Tipo de cambio Banorte con el que se generó el estado de cuenta.',
+    )
+    data_seconds = fields.Float(string='Datos (s)', digits=(12, 3))
+    render_seconds = fields.Float(string='Render (s)', digits=(12, 3))
+    total_seconds = fields.Float(string='Total (s)', digits=(12, 3), aggregator='avg')
+    total_queries = fields.Integer(string='Consultas SQL', aggregator='avg')
+    is_slow = fields.Boolean(string='Lento', index=True)
+    phases = fields.Text(string='Fases (JSON)')
+
+    @api.autovacuum
+    def _gc_old_runs(self):
+        """Borra las corridas más antiguas que la retención (0 = conservar todas)."""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.run_retention_days', 90,
+        ) or 0)
+        if retention_days <= 0:
+            return
+        self.env.cr.execute("""
+            DELETE FROM account_statement_run
+             WHERE create_date < %s
+        """, [fields.Datetime.now() - timedelta(days=retention_days)])
+        _logger.info('Corridas de estado de cuenta: %s borradas', self.env.cr.rowcount)
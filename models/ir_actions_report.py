@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+import contextlib
+import io
+import logging
+import tempfile
+
+from reportlab.pdfgen import canvas
+
+from .statement_profiler import StatementProfiler, profile_phase
+
+_logger = logging.getLogger(__name__)
+
+STATEMENT_REPORT = 'account_statement_report.account_statement'
+
+# En renders por bloques cada bloque numeraría sus páginas desde 1: se oculta
+# el contador del layout (`.page` / `.topage` y su contenedor) y la
+# numeración se estampa sobre el PDF ya unido.
+HIDE_PAGE_COUNTER_SCRIPT = """
+<script>
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('.topage').forEach(function (el) {
+            el.parentNode.style.display = 'none';
+        });
+    });
+</script>
+"""
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        report = self._get_report(report_ref)
+        if report.report_name != STATEMENT_REPORT or not data or data.get('statement_chunk'):
+            return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
+
+        # Estado de cuenta directo de una orden: solo lectura, sin corrida,
+        # sin caché de PDF ni escrituras de caché.
+        direct = bool(data.get('order_id') and not data.get('wizard_id'))
+        if direct:
+            self = self.with_context(statement_readonly=True, statement_pdf_cache_bypass=True)
+        profiler = StatementProfiler(self.env, 'render', run_id=data.get('run_id'))
+        with profiler.activate():
+            pdf_content, report_type = self._render_statement_pdf_cached(report_ref, res_ids, data)
+        profiler.payload_size = len(pdf_content or b'')
+        # Solo se completa la corrida creada al preparar los datos.
+        profiler.finish(persist=bool(data.get('run_id')))
+        return pdf_content, report_type
+
+    def _render_statement_pdf_cached(self, report_ref, res_ids, data):
+        """Sirve el PDF desde la caché por contenido o lo renderiza y guarda.
+
+        El contexto `statement_pdf_cache_bypass` fuerza el render completo.
+        """
+        if self.env.context.get('statement_pdf_cache_bypass'):
+            return self._render_statement_pdf_chunks(report_ref, res_ids, data)
+
+        PdfCache = self.env['account.statement.pdf.cache'].sudo()
+        with profile_phase(self.env, 'pdf_cache') as phase:
+            parser = self.env['report.%s' % STATEMENT_REPORT]
+            report_data = parser._resolve_statement_data(data, res_ids)
+            key = PdfCache._make_key(
+                report_data, self._get_report(report_ref), parser._statement_company(report_data),
+            )
+            pdf_content = PdfCache._lookup(key)
+            phase['rows'] = 1 if pdf_content else 0
+        if pdf_content:
+            _logger.info("Estado de cuenta servido desde la caché de PDF (%s)", key[:16])
+            return pdf_content, 'pdf'
+
+        # Los datos ya resueltos viajan al render: no se vuelven a armar.
+        pdf_content, report_type = self._render_statement_pdf_chunks(
+            report_ref, res_ids, dict(data, **report_data),
+        )
+        PdfCache._store(key, pdf_content, report_data.get('report_currency'))
+        return pdf_content, report_type
+
+    def _render_statement_pdf_chunks(self, report_ref, res_ids, data):
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.pdf_chunk_size', 50,
+        ) or 0)
+        parser = self.env['report.%s' % STATEMENT_REPORT]
+        if 'orders_data' not in data.get('data', data):
+            # Los datos se arman una sola vez; el conteo y cada bloque los reciben.
+            data = dict(data, **parser._resolve_statement_data(data, res_ids))
+        # El layout (logo, encabezado, formato de papel) es el de la compañía
+        # del estado de cuenta, no el de la compañía activa.
+        company_report = self.with_company(parser._statement_company(data.get('data', data)))
+        total_orders = parser._count_statement_orders(data, res_ids)
+        if chunk_size <= 0 or total_orders <= chunk_size:
+            return super(IrActionsReport, company_report)._render_qweb_pdf(
+                report_ref, res_ids=res_ids, data=data,
+            )
+
+        # Render por bloques de N órdenes: cada pasada genera un HTML acotado
+        # para wkhtmltopdf; el Resumen Final y el saldo a favor van al final.
+        # Cada PDF parcial va a un archivo temporal en cuanto se genera.
+        chunk_report = company_report.with_context(statement_pdf_chunked=True)
+        with contextlib.ExitStack() as stack:
+            chunk_files = []
+            for start in range(0, total_orders, chunk_size):
+                stop = min(start + chunk_size, total_orders)
+                chunk_data = dict(data, statement_chunk={
+                    'start': start,
+                    'stop': stop,
+                    'last': stop >= total_orders,
+                })
+                pdf_content, _report_type = super(IrActionsReport, chunk_report)._render_qweb_pdf(
+                    report_ref, res_ids=res_ids, data=chunk_data,
+                )
+                chunk_file = stack.enter_context(tempfile.TemporaryFile())
+                chunk_file.write(pdf_content)
+                chunk_files.append(chunk_file)
+            _logger.info(
+                "Estado de cuenta renderizado en %s bloques de %s órdenes (%s órdenes)",
+                len(chunk_files), chunk_size, total_orders,
+            )
+            return self._stamp_statement_page_numbers(chunk_files), 'pdf'
+
+    def _stamp_statement_page_numbers(self, pdf_files):
+        """Une los PDFs de `pdf_files` y estampa "Página X / N" al pie.
+
+        `pdf_files` son archivos abiertos (o `BytesIO`); sus páginas se leen
+        del archivo al escribir el resultado, sin copias intermedias del PDF
+        unido.
+        """
+        readers = [PdfFileReader(pdf_file, strict=False) for pdf_file in pdf_files]
+        total_pages = sum(len(reader.pages) for reader in readers)
+        writer = PdfFileWriter()
+        first_number = 1
+        for reader in readers:
+            overlay = PdfFileReader(self._statement_page_number_overlay(
+                reader.pages, first_number, total_pages,
+            ))
+            for page, number_page in zip(reader.pages, overlay.pages):
+                page.merge_page(number_page)
+                writer.add_page(page)
+            first_number += len(reader.pages)
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    def _statement_page_number_overlay(self, pages, first_number, total_pages):
+        """PDF con solo el número de página, una hoja por cada una de `pages`."""
+        packet = io.BytesIO()
+        overlay = canvas.Canvas(packet)
+        for number, page in enumerate(pages, start=first_number):
+            width = float(abs(page.mediabox.width))
+            overlay.setPageSize((width, float(abs(page.mediabox.height))))
+            overlay.setFont('Helvetica', 8)
+            overlay.setFillGray(0.45)
+            overlay.drawCentredString(width / 2, 14, 'Página %s / %s' % (number, total_pages))
+            overlay.showPage()
+        overlay.save()
+        packet.seek(0)
+        return packet
+
+    def _render_qweb_html(self, report_ref, docids, data=None):
+        if StatementProfiler.current(self.env) is None:
+            return super()._render_qweb_html(report_ref, docids, data=data)
+        with profile_phase(self.env, 'qweb_html'):
+            return super()._render_qweb_html(report_ref, docids, data=data)
+
+    def _run_wkhtmltopdf(self, bodies, *args, **kwargs):
+        footer = kwargs.get('footer')
+        if footer and self.env.context.get('statement_pdf_chunked'):
+            footer = str(footer)
+            if '</head>' in footer:
+                footer = footer.replace('</head>', HIDE_PAGE_COUNTER_SCRIPT + '</head>', 1)
+            else:
+                footer = HIDE_PAGE_COUNTER_SCRIPT + footer
+            kwargs['footer'] = footer
+        if StatementProfiler.current(self.env) is None:
+            return super()._run_wkhtmltopdf(bodies, *args, **kwargs)
+        with profile_phase(self.env, 'wkhtmltopdf') as phase:
+            phase['rows'] = len(bodies)
+            return super()._run_wkhtmltopdf(bodies, *args, **kwargs)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+BANORTE_RATE_PARAM = 'banorte.last_rate'
+
+
+class IrConfigParameter(models.Model):
+    _inherit = 'ir.config_parameter'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if not any(vals.get('key') == BANORTE_RATE_PARAM for vals in vals_list):
+            return super().create(vals_list)
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        records = super().create(vals_list)
+        Provider._rate_changed(previous_rates)
+        return records
+
+    def write(self, vals):
+        if not any(param.key == BANORTE_RATE_PARAM for param in self):
+            return super().write(vals)
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        res = super().write(vals)
+        Provider._rate_changed(previous_rates)
+        return res
+
+    def unlink(self):
+        # `set_param(key, False)` borra el parámetro.
+        if not any(param.key == BANORTE_RATE_PARAM for param in self):
+            return super().unlink()
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        res = super().unlink()
+        Provider._rate_changed(previous_rates)
+        return res
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = 'res.currency.rate'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        rates = super().create(vals_list)
+        Provider._rate_changed(previous_rates, rates.currency_id.mapped('name'))
+        return rates
+
+    def write(self, vals):
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        currency_names = set(self.currency_id.mapped('name'))
+        res = super().write(vals)
+        Provider._rate_changed(previous_rates, currency_names | set(self.currency_id.mapped('name')))
+        return res
+
+    def unlink(self):
+        Provider = self.env['account.statement.rate.provider']
+        previous_rates = Provider._get_company_rates()
+        currency_names = self.currency_id.mapped('name')
+        res = super().unlink()
+        Provider._rate_changed(previous_rates, currency_names)
+        return res
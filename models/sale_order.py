@@ -1,9 +1,36 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists, create_index
+import hashlib
 import logging
+import math
+
+from .statement_lines import STATEMENT_LINE_FIELDS, make_statement_line
+from .statement_rates import StatementRateTable
+from .statement_workers import get_max_workers, in_worker_thread, run_in_workers, split_chunks
 
 _logger = logging.getLogger(__name__)
 
+# Índices del estado de cuenta: (nombre, columnas, condición parcial).
+# - Filtros del wizard (`_get_base_domain`): cliente + estado + fecha.
+# - Filtro por proyecto del wizard.
+# - Saldo global del cliente (solo órdenes confirmadas), con el saldo MXN
+#   materializado para sumarlo sin leer la tabla.
+STATEMENT_INDEXES = [
+    ('sale_order_statement_partner_state_date_idx', ['partner_id', 'state', 'date_order'], ''),
+    ('sale_order_statement_project_partner_idx', ['x_project_id', 'partner_id'], 'x_project_id IS NOT NULL'),
+    ('sale_order_statement_confirmed_partner_idx', ['partner_id', 'x_statement_balance_mxn'],
+     "state IN ('sale', 'done')"),
+]
+
+
+def _build_statement_shard(env, shard):
+    """Worker: datos de estado de cuenta de un bloque de órdenes."""
+    order_ids, banorte_rate, mxn_rates, payment_rows_by_order = shard
+    rates = StatementRateTable.from_dict(mxn_rates, banorte_rate)
+    return env['sale.order'].browse(order_ids)._statement_build_batch(rates, payment_rows_by_order)
+
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
@@ -24,26 +51,267 @@ class SaleOrder(models.Model):
     x_has_customer_credit = fields.Boolean(
         compute='_compute_customer_credit_balance',
     )
+    x_statement_total_paid = fields.Monetary(
+        string='Pagado (Estado de Cuenta)',
+        compute='_compute_statement_balance',
+        store=True,
+        currency_field='currency_id',
+        help='Pagos conciliados con las facturas de la orden, en la moneda de la orden.',
+    )
+    x_statement_balance = fields.Monetary(
+        string='Saldo (Estado de Cuenta)',
+        compute='_compute_statement_balance',
+        store=True,
+        index=True,
+        currency_field='currency_id',
+        help='Total de la orden menos pagos conciliados, en la moneda de la orden. '
+             'Negativo = saldo a favor.',
+    )
+    x_statement_balance_mxn = fields.Monetary(
+        string='Saldo MXN (Estado de Cuenta)',
+        compute='_compute_statement_balance',
+        store=True,
+        currency_field='x_company_currency_id',
+        help='Saldo de la orden convertido a MXN con el tipo de cambio Banorte.',
+    )
+    x_statement_is_open = fields.Boolean(
+        string='Con Saldo Pendiente',
+        compute='_compute_statement_balance',
+        store=True,
+        index=True,
+    )
+
+    def init(self):
+        super().init()
+        for index_name, columns, where in STATEMENT_INDEXES:
+            if all(column_exists(self.env.cr, self._table, column) for column in columns):
+                create_index(self.env.cr, index_name, self._table, columns, where=where)
 
     def _statement_banorte_rate(self):
         """Tipo de cambio Banorte, idéntico al usado por el wizard/reporte."""
-        rate_param = self.env['ir.config_parameter'].sudo().get_param('banorte.last_rate', '0')
-        try:
-            rate = float(rate_param)
-        except (ValueError, TypeError):
-            rate = 0.0
-
-        if rate <= 0:
-            usd = self.env.ref('base.USD', raise_if_not_found=False)
-            company_currency = self.env.company.currency_id
-            if usd and company_currency and company_currency.name == 'MXN':
-                rate = usd._convert(1.0, company_currency, self.env.company, fields.Date.today())
-            elif usd and company_currency and company_currency.name == 'USD':
-                mxn = self.env.ref('base.MXN', raise_if_not_found=False)
-                if mxn:
-                    rate = mxn._convert(1.0, usd, self.env.company, fields.Date.today())
-                    rate = 1 / rate if rate > 0 else 0
-        return rate
+        return self.env['account.statement.rate.provider']._get_banorte_rate()
+
+    def _statement_rate_table(self, banorte_rate, currency_names=None):
+        """Tabla de tipos de cambio del estado de cuenta (ver `StatementRateTable`).
+
+        Sin `currency_names` incluye todas las monedas activas. Usa la compañía
+        de las órdenes si es una sola, si no la compañía activa.
+        """
+        if currency_names is None:
+            currency_names = self.env['res.currency'].sudo().search([]).mapped('name')
+        company = self.company_id if len(self.company_id) == 1 else None
+        return StatementRateTable.build(self.env, banorte_rate, currency_names, company=company)
+
+    def _statement_convert_payment(self, amount, payment_currency_id,
+                                   payment_currency_name, rates):
+        """Monto de un pago expresado en la moneda de ESTA orden.
+
+        Misma moneda sin conversión; cualquier otra con la tabla de tipos de
+        cambio del estado de cuenta (Banorte para USD/MXN). Sin tasa, el monto
+        se toma sin convertir.
+        """
+        self.ensure_one()
+        if payment_currency_id == self.currency_id.id:
+            return amount
+        return rates.convert(amount, payment_currency_name, self.currency_id.name or 'USD')
+
+    def _statement_flush(self):
+        """Escribe en BD los campos que leen las consultas SQL del estado de cuenta."""
+        self.env['sale.order'].flush_model(['amount_total', 'currency_id', 'state', 'partner_id'])
+        self.env['sale.order.line'].flush_model(['order_id', 'invoice_lines'])
+        self.env['account.move'].flush_model(['state', 'move_type', 'origin_payment_id'])
+        self.env['account.move.line'].flush_model(['move_id', 'account_id'])
+        self.env['account.partial.reconcile'].flush_model(['debit_move_id', 'credit_move_id'])
+        self.env['account.payment'].flush_model(['amount', 'currency_id', 'date', 'name'])
+
+    @api.model
+    def _statement_payment_ledger_sql(self, order_filter):
+        """SQL del libro de pagos conciliados con las facturas de las órdenes.
+
+        `order_filter` es una condición SQL sobre `sol.order_id`. Una fila por
+        (orden, pago): un pago conciliado con varias facturas de la misma
+        orden cuenta una sola vez. Columnas: order_id, payment_id, amount,
+        currency_id, currency_name, date, name.
+        """
+        return SQL("""
+            WITH order_invoices AS (
+                SELECT DISTINCT sol.order_id, am.id AS invoice_id
+                  FROM sale_order_line sol
+                  JOIN sale_order_line_invoice_rel rel ON rel.order_line_id = sol.id
+                  JOIN account_move_line inv_line ON inv_line.id = rel.invoice_line_id
+                  JOIN account_move am ON am.id = inv_line.move_id
+                 WHERE %(order_filter)s
+                   AND am.state = 'posted'
+                   AND am.move_type = 'out_invoice'
+            ),
+            order_payments AS (
+                SELECT oi.order_id, pay_move.origin_payment_id AS payment_id
+                  FROM order_invoices oi
+                  JOIN account_move_line rec_line ON rec_line.move_id = oi.invoice_id
+                  JOIN account_account acc ON acc.id = rec_line.account_id
+                  JOIN account_partial_reconcile apr ON apr.debit_move_id = rec_line.id
+                  JOIN account_move_line counterpart ON counterpart.id = apr.credit_move_id
+                  JOIN account_move pay_move ON pay_move.id = counterpart.move_id
+                 WHERE acc.account_type IN ('asset_receivable', 'liability_payable')
+                   AND pay_move.origin_payment_id IS NOT NULL
+                UNION
+                SELECT oi.order_id, pay_move.origin_payment_id AS payment_id
+                  FROM order_invoices oi
+                  JOIN account_move_line rec_line ON rec_line.move_id = oi.invoice_id
+                  JOIN account_account acc ON acc.id = rec_line.account_id
+                  JOIN account_partial_reconcile apr ON apr.credit_move_id = rec_line.id
+                  JOIN account_move_line counterpart ON counterpart.id = apr.debit_move_id
+                  JOIN account_move pay_move ON pay_move.id = counterpart.move_id
+                 WHERE acc.account_type IN ('asset_receivable', 'liability_payable')
+                   AND pay_move.origin_payment_id IS NOT NULL
+            )
+            SELECT op.order_id, pay.id AS payment_id,
+                   pay.amount::float8 AS amount, pay.currency_id, cur.name AS currency_name,
+                   pay.date, pay.name
+              FROM order_payments op
+              JOIN account_payment pay ON pay.id = op.payment_id
+              LEFT JOIN res_currency cur ON cur.id = pay.currency_id
+        """, order_filter=order_filter)
+
+    def _statement_payment_ledger(self):
+        """Libro de pagos conciliados de TODAS las órdenes, en una consulta.
+
+        sale.order.line -> facturas out_invoice publicadas -> líneas por
+        cobrar -> account.partial.reconcile -> asiento del pago. Alimenta la
+        tabla de Pagos y el total pagado del estado de cuenta y de los saldos
+        materializados.
+
+        Retorna lista de dicts con order_id, payment_id, amount, currency_id,
+        currency_name, date y name, ordenada por orden, fecha y pago.
+        """
+        if not self:
+            return []
+        self._statement_flush()
+        self.env.cr.execute(SQL(
+            "%s ORDER BY op.order_id, pay.date, pay.id",
+            self._statement_payment_ledger_sql(SQL("sol.order_id = ANY(%s)", self.ids)),
+        ))
+        return [
+            {
+                'order_id': order_id,
+                'payment_id': payment_id,
+                'amount': amount or 0.0,
+                'currency_id': currency_id,
+                'currency_name': currency_name,
+                'date': str(date) if date else '',
+                'name': name or '',
+            }
+            for order_id, payment_id, amount, currency_id, currency_name, date, name
+            in self.env.cr.fetchall()
+        ]
+
+    def _statement_balance_batch(self, banorte_rate, rates=None):
+        """Saldos de estado de cuenta de TODO el recordset en consultas fijas.
+
+        Misma lógica que `_get_statement_data`: balance = total de la orden -
+        pagos conciliados (monto completo del pago) en moneda de la orden, y
+        balance_mxn convertido con la tabla de tipos de cambio.
+
+        Retorna {order_id: {'total_paid': ..., 'balance': ..., 'balance_mxn': ...}}.
+        """
+        if not self:
+            return {}
+        # Una sola lectura de total/moneda para todo el recordset.
+        self.fetch(['amount_total', 'currency_id'])
+        self.currency_id.fetch(['name'])
+
+        payment_rows = self._statement_payment_ledger()
+        if rates is None:
+            rates = self._statement_rate_table(banorte_rate, {
+                row['currency_name'] for row in payment_rows
+            } | set(self.currency_id.mapped('name')))
+
+        paid_by_order = dict.fromkeys(self.ids, 0.0)
+        orders_by_id = {order.id: order for order in self}
+        for row in payment_rows:
+            order = orders_by_id[row['order_id']]
+            paid_by_order[order.id] += order._statement_convert_payment(
+                row['amount'],
+                row['currency_id'],
+                row['currency_name'],
+                rates,
+            )
+
+        result = {}
+        for order in self:
+            total_paid = paid_by_order[order.id]
+            balance = order.amount_total - total_paid  # en moneda de la orden
+            # Sin tipo de cambio el saldo se toma tal cual (se asume en pesos).
+            balance_mxn = rates.convert(balance, order.currency_id.name or 'USD', 'MXN')
+            result[order.id] = {
+                'total_paid': total_paid,
+                'balance': balance,
+                'balance_mxn': balance_mxn,
+            }
+        return result
+
+    @api.depends(
+        'amount_total', 'currency_id', 'company_id',
+        'order_line.invoice_lines.move_id.state',
+        'order_line.invoice_lines.move_id.amount_residual',
+        'order_line.invoice_lines.move_id.payment_state',
+    )
+    def _compute_statement_balance(self):
+        """Saldos del estado de cuenta materializados en la orden.
+
+        Solo se recalculan cuando cambian las facturas de la orden o sus
+        conciliaciones (vía `amount_residual`/`payment_state`), o cuando
+        cambia el tipo de cambio (`account.statement.rate.recompute`).
+        """
+        orders = self.filtered('id')
+        for company in orders.company_id:
+            company_orders = orders.filtered(lambda o: o.company_id == company)
+            rate = self.env['account.statement.rate.provider']._get_banorte_rate(company=company)
+            balances = company_orders._statement_balance_batch(rate)
+            for order in company_orders:
+                vals = balances[order.id]
+                order.x_statement_total_paid = vals['total_paid']
+                order.x_statement_balance = vals['balance']
+                order.x_statement_balance_mxn = vals['balance_mxn']
+                order.x_statement_is_open = abs(vals['balance']) > 0.01
+        for order in self - orders:
+            order.x_statement_total_paid = 0.0
+            order.x_statement_balance = order.amount_total
+            order.x_statement_balance_mxn = 0.0
+            order.x_statement_is_open = abs(order.amount_total) > 0.01
+
+    @api.model
+    def _statement_rate_dependent_order_ids(self, currency_names=None):
+        """Órdenes cuyo saldo depende del tipo de cambio de `currency_names`.
+
+        Son las órdenes en esas monedas (distintas de MXN, su saldo en MXN) y
+        las que tienen pagos en otra moneda que involucre alguna de ellas (el
+        pago se convierte a la moneda de la orden). Sin `currency_names`, las
+        de todas las monedas.
+        """
+        self._statement_flush()
+        names = list(currency_names) if currency_names is not None else None
+        currency_filter = SQL("TRUE") if names is None else SQL("cur.name = ANY(%s)", names)
+        payment_filter = SQL("TRUE") if names is None else SQL(
+            "(pr.currency_name = ANY(%s) OR cur.name = ANY(%s))", names, names,
+        )
+        self.env.cr.execute(SQL("""
+            SELECT so.id
+              FROM sale_order so
+              JOIN res_currency cur ON cur.id = so.currency_id
+             WHERE cur.name != 'MXN'
+               AND %(currency_filter)s
+            UNION
+            SELECT pr.order_id
+              FROM (%(payments)s) pr
+              JOIN sale_order so ON so.id = pr.order_id
+              JOIN res_currency cur ON cur.id = so.currency_id
+             WHERE pr.currency_id != so.currency_id
+               AND %(payment_filter)s
+             ORDER BY 1
+        """, currency_filter=currency_filter, payment_filter=payment_filter,
+            payments=self._statement_payment_ledger_sql(SQL("TRUE"))))
+        return [order_id for order_id, in self.env.cr.fetchall()]
 
     def _statement_balance_mxn(self, banorte_rate):
         """Saldo (balance) de ESTA orden expresado en MXN.
@@ -53,26 +321,39 @@ class SaleOrder(models.Model):
         convertido a MXN con el tipo de cambio Banorte. Negativo = saldo a favor.
         """
         self.ensure_one()
-        currency_name = self.currency_id.name or 'USD'
+        return self._statement_balance_batch(banorte_rate)[self.id]['balance_mxn']
 
-        total_paid = 0.0
-        for inv in self._get_related_invoices():
-            for payment in inv._get_reconciled_payments():
-                if payment.currency_id == self.currency_id:
-                    total_paid += payment.amount
-                elif payment.currency_id.name == 'MXN' and currency_name == 'USD' and banorte_rate > 0:
-                    total_paid += payment.amount / banorte_rate
-                elif payment.currency_id.name == 'USD' and currency_name == 'MXN' and banorte_rate > 0:
-                    total_paid += payment.amount * banorte_rate
-                else:
-                    total_paid += payment.amount
-
-        balance = self.amount_total - total_paid  # en moneda de la orden
-
-        if currency_name == 'USD' and banorte_rate > 0:
-            return balance * banorte_rate
-        # MXN (o moneda de compañía) se asume ya en pesos
-        return balance
+    def _statement_partner_balances_mxn(self, partners, banorte_rate):
+        """Saldo global en MXN por cliente comercial, en consultas fijas.
+
+        Suma el saldo en MXN materializado (`x_statement_balance_mxn`) de
+        TODAS las órdenes confirmadas de cada cliente. Mientras haya un
+        recálculo por tipo de cambio pendiente (`account.statement.rate.recompute`)
+        ese saldo puede ser del tipo anterior: se calcula al momento con
+        `banorte_rate`. Retorna {commercial_partner_id: balance_mxn}.
+        """
+        partners = partners.commercial_partner_id
+        if not partners:
+            return {}
+        result = dict.fromkeys(partners.ids, 0.0)
+        SaleOrder = self.env['sale.order'].sudo()
+        domain = [
+            ('partner_id.commercial_partner_id', 'in', partners.ids),
+            ('state', 'in', ['sale', 'done']),
+        ]
+        if self.env['account.statement.rate.recompute'].sudo().search_count([], limit=1):
+            orders = SaleOrder.search(domain)
+            balances = orders._statement_balance_batch(banorte_rate)
+            for order in orders:
+                partner_id = order.partner_id.commercial_partner_id.id
+                result[partner_id] = result.get(partner_id, 0.0) + balances[order.id]['balance_mxn']
+            return result
+
+        groups = SaleOrder._read_group(domain, ['partner_id'], ['x_statement_balance_mxn:sum'])
+        for partner, balance_mxn in groups:
+            partner_id = partner.commercial_partner_id.id
+            result[partner_id] = result.get(partner_id, 0.0) + balance_mxn
+        return result
 
     @api.depends(
         'partner_id', 'amount_total',
@@ -83,28 +364,45 @@ class SaleOrder(models.Model):
     )
     def _compute_customer_credit_balance(self):
         banorte_rate = self._statement_banorte_rate()
+        partners = self.partner_id.commercial_partner_id
+        # Saldo global del cliente = suma del balance (en MXN) de TODAS sus
+        # órdenes confirmadas, con la misma lógica del reporte. Se lee del
+        # saldo materializado por cliente (account.statement.credit.ledger).
+        # Si el neto es negativo, hay saldo a favor.
+        global_balances = self.env['account.statement.credit.ledger'].sudo()._get_partner_balances(
+            partners, banorte_rate,
+        )
         for order in self:
             partner = order.partner_id.commercial_partner_id or order.partner_id
             balance = 0.0
-            if partner:
-                # Saldo global del cliente = suma del balance (en MXN) de TODAS
-                # sus órdenes confirmadas, con la misma lógica del reporte.
-                # Si el neto es negativo, hay saldo a favor.
-                client_orders = self.env['sale.order'].sudo().search([
-                    ('partner_id.commercial_partner_id', '=', partner.id),
-                    ('state', 'in', ['sale', 'done']),
-                ])
-                total_balance_mxn = 0.0
-                for o in client_orders:
-                    try:
-                        total_balance_mxn += o._statement_balance_mxn(banorte_rate)
-                    except Exception:
-                        continue
-                if total_balance_mxn < -0.01:
-                    balance = -total_balance_mxn
+            total_balance_mxn = global_balances.get(partner.id, 0.0) if partner else 0.0
+            if total_balance_mxn < -0.01:
+                balance = -total_balance_mxn
             order.x_customer_credit_balance = balance
             order.x_has_customer_credit = balance > 0.01
 
+    def _statement_invalidate_credit(self):
+        """Marca sucio el saldo global de los clientes de estas órdenes."""
+        orders = self.filtered(lambda o: o.id)
+        if orders:
+            self.env['account.statement.credit.ledger'].sudo()._invalidate_partners(
+                orders.partner_id
+            )
+
+    def _compute_amounts(self):
+        super()._compute_amounts()
+        self._statement_invalidate_credit()
+
+    def write(self, vals):
+        tracked = {'state', 'partner_id', 'currency_id'}
+        if tracked.intersection(vals):
+            # Cliente anterior y nuevo, por si cambia el partner de la orden.
+            self._statement_invalidate_credit()
+            res = super().write(vals)
+            self._statement_invalidate_credit()
+            return res
+        return super().write(vals)
+
     def _get_related_invoices(self):
         """Retorna las facturas relacionadas a esta orden de venta."""
         self.ensure_one()
@@ -115,32 +413,57 @@ class SaleOrder(models.Model):
     def _get_related_payments(self):
         """Retorna los pagos relacionados a las facturas de esta orden."""
         self.ensure_one()
-        invoices = self._get_related_invoices()
-        payments = self.env['account.payment']
-        for inv in invoices:
-            for partial in inv._get_reconciled_payments():
-                payments |= partial
-        return payments
+        return self.env['account.payment'].browse(
+            row['payment_id'] for row in self._statement_payment_ledger()
+        )
 
     def action_print_account_statement(self):
-        """Genera el estado de cuenta solo para esta orden de venta."""
+        """Genera el estado de cuenta solo para esta orden de venta.
+
+        No crea registros: el reporte recibe solo la referencia a la orden y
+        los datos se arman al renderizar (`_prepare_order_statement_data`).
+        """
         self.ensure_one()
-        currency_name = (self.currency_id.name or '').upper()
-        if currency_name == 'USD':
-            report_currency = 'usd'
-        elif currency_name == 'MXN':
-            report_currency = 'mxn'
-        else:
-            report_currency = 'mxn'
+        return self.env.ref('account_statement_report.action_report_account_statement').report_action(
+            None, data={
+                'order_id': self.id,
+                'report_currency': self._statement_report_currency(),
+            },
+        )
+
+    def _statement_report_currency(self):
+        """Divisa del estado de cuenta de una sola orden: la de la orden."""
+        self.ensure_one()
+        return 'usd' if (self.currency_id.name or '').upper() == 'USD' else 'mxn'
+
+    def _prepare_order_statement_data(self, report_currency):
+        """Datos del estado de cuenta de ESTA orden, sin wizard.
 
-        wizard = self.env['account.statement.wizard'].create({
+        Mismo dict que `account.statement.wizard._prepare_statement_data` con
+        la orden seleccionada. El encabezado se arma con un wizard en memoria
+        (`new`), así que no se inserta ninguna fila. Con el contexto
+        `statement_readonly` tampoco se escriben la caché por orden ni el
+        saldo global del cliente: solo se leen.
+        """
+        self.ensure_one()
+        self = self.with_context(statement_readonly=True)
+        Wizard = self.env['account.statement.wizard']
+        rates = self._statement_rate_table(self._statement_banorte_rate())
+        order_data = self._get_statement_data_batch(rates.banorte_rate, rates=rates)[0]
+        totals = Wizard._new_statement_totals()
+        Wizard._add_statement_totals(totals, order_data, rates)
+        wizard = Wizard.new({
             'partner_id': self.partner_id.id,
-            'order_ids': [(6, 0, [self.id])],
             'report_currency': report_currency,
-            'include_fully_paid': True,
-            'include_draft': self.state in ('draft', 'sent'),
         })
-        return wizard.action_print_statement()
+        data = wizard._statement_header(rates, totals)
+        data.update({
+            'wizard_id': False,
+            'company_id': self.company_id.id,
+            'order_id': self.id,
+            'orders_data': [order_data],
+        })
+        return data
 
     # ═══════════════════════════════════════════════════════════════════
     # Devoluciones SOM para Estado de Cuenta
@@ -164,15 +487,22 @@ class SaleOrder(models.Model):
         y, si tienen picking de devolución, con picking validado.
         """
         self.ensure_one()
+        return self._get_statement_return_documents_batch()[self.id]
+
+    def _get_statement_return_documents_batch(self):
+        """Devoluciones confirmadas de TODO el recordset, leídas de una vez.
 
+        Retorna {order_id: sale.delivery.document}.
+        """
+        Document = self.env['sale.delivery.document']
         if 'delivery_document_ids' in self._fields:
             docs = self.delivery_document_ids
         else:
-            docs = self.env['sale.delivery.document'].search([
-                ('sale_order_id', '=', self.id),
+            docs = Document.search([
+                ('sale_order_id', 'in', self.ids),
             ])
 
-        return docs.filtered(
+        docs = docs.filtered(
             lambda d: d.document_type == 'return'
             and d.state == 'confirmed'
             and (
@@ -181,6 +511,15 @@ class SaleOrder(models.Model):
             )
         )
 
+        doc_ids_by_order = {order.id: [] for order in self}
+        for doc in docs:
+            if doc.sale_order_id.id in doc_ids_by_order:
+                doc_ids_by_order[doc.sale_order_id.id].append(doc.id)
+        return {
+            order_id: Document.browse(doc_ids).with_prefetch(docs._prefetch_ids)
+            for order_id, doc_ids in doc_ids_by_order.items()
+        }
+
     def _get_statement_return_lines_data(self, return_docs):
         """Construye líneas primitivas de devolución para QWeb."""
         self.ensure_one()
@@ -234,17 +573,26 @@ class SaleOrder(models.Model):
 
         return result
 
-    def _get_statement_returned_qty_for_sale_line(self, line, return_docs):
-        """Cantidad devuelta por línea de venta."""
-        qty_from_docs = 0.0
+    def _get_statement_returned_qty_index(self, return_docs):
+        """Índice de cantidades devueltas por (línea de venta, producto).
 
-        if return_docs:
-            return_lines = return_docs.mapped('line_ids').filtered(
-                lambda dl: dl.sale_line_id == line
-                and dl.product_id == line.product_id
-            )
-            for return_line in return_lines:
-                qty_from_docs += self._statement_return_qty_from_doc_line(return_line)
+        Se construye una sola vez a partir de las líneas de los documentos de
+        devolución SOM, en lugar de filtrar todas las líneas de devolución por
+        cada línea de venta.
+        """
+        index = {}
+        for doc_line in return_docs.line_ids:
+            if not doc_line.sale_line_id:
+                continue
+            key = (doc_line.sale_line_id.id, doc_line.product_id.id)
+            index[key] = index.get(key, 0.0) + self._statement_return_qty_from_doc_line(doc_line)
+        return index
+
+    def _get_statement_returned_qty_for_sale_line(self, line, return_docs, returned_index=None):
+        """Cantidad devuelta por línea de venta."""
+        if returned_index is None:
+            returned_index = self._get_statement_returned_qty_index(return_docs)
+        qty_from_docs = returned_index.get((line.id, line.product_id.id), 0.0)
 
         qty_from_line = 0.0
         if 'x_returned_qty' in line._fields:
@@ -283,12 +631,266 @@ class SaleOrder(models.Model):
         100% datos primitivos serializables - sin recordsets.
         """
         self.ensure_one()
+        return self._get_statement_data_batch(banorte_rate)[0]
+
+    def _statement_prefetch(self, return_docs):
+        """Carga de una vez líneas, productos, UdM y devoluciones del recordset."""
+        self.fetch(['name', 'date_order', 'user_id', 'currency_id',
+                    'amount_total', 'amount_untaxed', 'amount_tax'])
+        self.mapped('currency_id.name')
+        self.mapped('user_id.name')
+
+        lines = self.order_line
+        lines.fetch(['display_type', 'product_id', 'name', 'product_uom_qty',
+                     'qty_delivered', 'price_unit', 'price_subtotal', 'price_tax',
+                     'price_total', 'product_uom_id'])
+        lines.product_id.mapped('display_name')
+        lines.product_id.mapped('type')
+        lines.product_uom_id.mapped('name')
+
+        doc_lines = return_docs.line_ids
+        doc_lines.mapped('sale_line_id')
+        doc_lines.mapped('product_id.display_name')
+        doc_lines.mapped('product_id.uom_id.name')
+        doc_lines.mapped('lot_id.name')
+        return_docs.mapped('return_picking_id.name')
+
+    def _get_statement_data_batch(self, banorte_rate=0.0, rates=None):
+        """
+        Datos de estado de cuenta para TODO el recordset, en el mismo orden.
+
+        Igual que `_get_statement_data`, pero lee líneas, productos, UdM,
+        facturas, pagos conciliados y devoluciones por adelantado, de modo que
+        el número de consultas no crece con el número de órdenes.
+
+        Las órdenes cuya huella (`_statement_fingerprints`) no cambió se sirven
+        desde `account.statement.order.cache`; el contexto
+        `statement_cache_bypass` fuerza el recálculo.
+
+        `rates` es la tabla de tipos de cambio del estado de cuenta; si no se
+        da, se arma con las monedas de las órdenes y de sus pagos.
+        """
+        if not self:
+            return []
+
+        payment_rows = self._statement_payment_ledger()
+        payment_rows_by_order = {order.id: [] for order in self}
+        for row in payment_rows:
+            payment_rows_by_order[row['order_id']].append(row)
+        if rates is None:
+            rates = self._statement_rate_table(banorte_rate, {
+                row['currency_name'] for row in payment_rows
+            } | set(self.currency_id.mapped('name')))
+
+        Cache = self.env['account.statement.order.cache'].sudo()
+        use_cache = not self.env.context.get('statement_cache_bypass')
+        store_cache = use_cache and not self.env.context.get('statement_readonly')
+        fingerprints = {}
+        cached = {}
+        if use_cache:
+            fingerprints = self._statement_fingerprints(rates, payment_rows_by_order)
+            cached = Cache._lookup(fingerprints)
+
+        missing = self.filtered(lambda o: o.id not in cached)
+        built = missing._statement_build_parallel(rates, payment_rows_by_order)
+        if store_cache and built:
+            Cache._store({
+                order_id: (fingerprints[order_id], data)
+                for order_id, data in built.items()
+            })
+
+        return [cached.get(order.id) or built[order.id] for order in self]
+
+    def _statement_build_parallel(self, rates, payment_rows_by_order):
+        """`_statement_build_batch` repartido en hilos con cursor de solo lectura.
+
+        Opcional: con `account_statement_report.parallel_order_workers` > 1
+        (acotado por el pool de conexiones) y al menos
+        `parallel_min_orders` órdenes, el recordset se parte en bloques que se
+        arman en paralelo. Los hilos solo ven datos ya confirmados en la base.
+        Los pagos y la tabla de tipos de cambio se calculan una sola vez aquí,
+        así que los totales son los mismos que en secuencia.
+
+        Retorna {order_id: dict}; el orden final (por `date_order`) lo da el
+        recordset en `_get_statement_data_batch`.
+        """
+        workers = get_max_workers(self.env, 'account_statement_report.parallel_order_workers', default=1)
+        min_orders = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.parallel_min_orders', 100,
+        ))
+        if workers <= 1 or len(self) < max(min_orders, 2) or in_worker_thread():
+            return self._statement_build_batch(rates, payment_rows_by_order)
+
+        shards = [
+            (order_ids, rates.banorte_rate, rates.to_dict(),
+             {order_id: payment_rows_by_order[order_id] for order_id in order_ids})
+            for order_ids in split_chunks(self.ids, math.ceil(len(self) / workers))
+        ]
+        built = {}
+        for shard_data in run_in_workers(self.env, shards, _build_statement_shard, workers, readonly=True):
+            built.update(shard_data)
+        _logger.debug("Estado de cuenta: %s órdenes armadas en %s hilos", len(self), len(shards))
+        return built
+
+    def _statement_build_batch(self, rates, payment_rows_by_order):
+        """Construye los datos de todas las órdenes del recordset.
+
+        Retorna {order_id: dict}.
+        """
+        if not self:
+            return {}
+
+        return_docs_by_order = self._get_statement_return_documents_batch()
+        all_return_docs = self.env['sale.delivery.document'].union(
+            *return_docs_by_order.values()
+        )
+        self._statement_prefetch(all_return_docs)
+
+        returned_index = self._get_statement_returned_qty_index(all_return_docs)
+
+        return {
+            order.id: order._statement_order_data(
+                rates,
+                return_docs_by_order[order.id],
+                payment_rows_by_order[order.id],
+                returned_index,
+            )
+            for order in self
+        }
+
+    def _statement_fingerprints(self, rates, payment_rows_by_order):
+        """Huella por orden de todo lo que alimenta su estado de cuenta.
+
+        Cubre la orden, su vendedor, sus líneas, productos, plantillas y UdM
+        (los nombres), las facturas publicadas, los documentos SOM con sus
+        líneas y el estado de su picking de devolución, los pagos conciliados
+        y el tipo de cambio de las monedas de la orden y de sus pagos. Se
+        obtiene con una sola consulta agregada para todo el recordset (más la
+        lectura de `write_date` de los pagos).
+
+        Retorna {order_id: sha1 hexdigest}.
+        """
+        self._statement_flush()
+        self.env['sale.order.line'].flush_model()
+        Document = self.env['sale.delivery.document']
+        line_field = Document._fields['line_ids']
+        DocumentLine = self.env[line_field.comodel_name]
+        Document.flush_model()
+        DocumentLine.flush_model()
+        self.env['stock.picking'].flush_model(['state'])
+        self.env['product.product'].flush_model(['product_tmpl_id'])
+        self.env['product.template'].flush_model()
+        self.env['uom.uom'].flush_model(['name'])
+        self.env['res.users'].flush_model(['partner_id'])
+        self.env['res.partner'].flush_model(['name'])
+        self.env.cr.execute(SQL("""
+            SELECT so.id, so.write_date, so.state, so.amount_total,
+                   seller.write_date, seller_partner.write_date,
+                   lines.cnt, lines.write_date, lines.qty_delivered, lines.price_total,
+                   lines.product_write_date, lines.template_write_date, lines.uom_write_date,
+                   invoices.fingerprint,
+                   docs.cnt, docs.write_date, docs.picking_states, doc_lines.cnt, doc_lines.write_date
+              FROM sale_order so
+              LEFT JOIN res_users seller ON seller.id = so.user_id
+              LEFT JOIN res_partner seller_partner ON seller_partner.id = seller.partner_id
+              LEFT JOIN LATERAL (
+                    SELECT count(*) AS cnt,
+                           max(sol.write_date) AS write_date,
+                           sum(sol.qty_delivered) AS qty_delivered,
+                           sum(sol.price_total) AS price_total,
+                           max(pp.write_date) AS product_write_date,
+                           max(pt.write_date) AS template_write_date,
+                           max(GREATEST(line_uom.write_date, product_uom.write_date)) AS uom_write_date
+                      FROM sale_order_line sol
+                      LEFT JOIN product_product pp ON pp.id = sol.product_id
+                      LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                      LEFT JOIN uom_uom line_uom ON line_uom.id = sol.product_uom_id
+                      LEFT JOIN uom_uom product_uom ON product_uom.id = pt.uom_id
+                     WHERE sol.order_id = so.id
+              ) lines ON TRUE
+              LEFT JOIN LATERAL (
+                    SELECT string_agg(
+                               am.id || ':' || am.write_date || ':' || am.amount_residual,
+                               ',' ORDER BY am.id
+                           ) AS fingerprint
+                      FROM account_move am
+                     WHERE am.state = 'posted'
+                       AND am.move_type = 'out_invoice'
+                       AND am.id IN (
+                            SELECT inv_line.move_id
+                              FROM sale_order_line sol
+                              JOIN sale_order_line_invoice_rel rel ON rel.order_line_id = sol.id
+                              JOIN account_move_line inv_line ON inv_line.id = rel.invoice_line_id
+                             WHERE sol.order_id = so.id
+                       )
+              ) invoices ON TRUE
+              LEFT JOIN LATERAL (
+                    SELECT count(*) AS cnt, max(doc.write_date) AS write_date,
+                           string_agg(doc.id || ':' || COALESCE(sp.state, ''), ',' ORDER BY doc.id)
+                               AS picking_states
+                      FROM %(documents)s doc
+                      LEFT JOIN stock_picking sp ON sp.id = doc.return_picking_id
+                     WHERE doc.sale_order_id = so.id
+              ) docs ON TRUE
+              LEFT JOIN LATERAL (
+                    SELECT count(*) AS cnt, max(doc_line.write_date) AS write_date
+                      FROM %(document_lines)s doc_line
+                      JOIN %(documents)s doc ON doc.id = doc_line.%(document_field)s
+                     WHERE doc.sale_order_id = so.id
+              ) doc_lines ON TRUE
+             WHERE so.id = ANY(%(order_ids)s)
+        """, documents=SQL.identifier(Document._table),
+            document_lines=SQL.identifier(DocumentLine._table),
+            document_field=SQL.identifier(line_field.inverse_name),
+            order_ids=self.ids))
+        rows = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+        payment_write_dates = {
+            payment.id: payment.write_date
+            for payment in self.env['account.payment'].browse({
+                row['payment_id']
+                for order_rows in payment_rows_by_order.values()
+                for row in order_rows
+            })
+        }
+
+        mxn_rates = rates.to_dict()
+        fingerprints = {}
+        for order in self:
+            order_payment_rows = payment_rows_by_order.get(order.id, [])
+            payments = [
+                (row['payment_id'], row['amount'], row['currency_id'],
+                 payment_write_dates.get(row['payment_id']))
+                for row in order_payment_rows
+            ]
+            # Solo las tasas que usa la orden: su moneda, la alterna (USD/MXN)
+            # y las de sus pagos. Una tasa EUR no invalida órdenes USD/MXN.
+            currency_names = {order.currency_id.name or 'USD', 'MXN', 'USD'}
+            currency_names.update(row['currency_name'] for row in order_payment_rows)
+            order_rates = sorted((name, mxn_rates.get(name)) for name in currency_names)
+            # Las columnas de línea forman parte de la huella: un cambio de
+            # formato descarta las entradas anteriores.
+            raw = repr((rows.get(order.id), payments, order_rates, STATEMENT_LINE_FIELDS))
+            fingerprints[order.id] = hashlib.sha1(raw.encode()).hexdigest()
+        return fingerprints
+
+    def _statement_order_data(self, rates, return_docs, payment_rows, returned_index=None):
+        """Arma el dict primitivo de UNA orden con datos ya precargados.
+
+        Las líneas de material y servicio son `StatementLine` (tuplas con
+        textos internados); `statement_lines()` las lee de vuelta.
+        """
+        self.ensure_one()
+        if returned_index is None:
+            returned_index = self._get_statement_returned_qty_index(return_docs)
         currency_name = self.currency_id.name or 'USD'
+        # Moneda alterna de las columnas: USD para órdenes en MXN, MXN para el resto.
+        alt_currency = 'USD' if currency_name == 'MXN' else 'MXN'
+        has_alt = rates.factor(currency_name, alt_currency) is not None
 
         material_lines = []
         service_lines = []
 
-        return_docs = self._get_statement_return_documents()
         return_lines = self._get_statement_return_lines_data(return_docs)
         total_returned_qty = sum(
             item.get('qty_returned', 0.0) or 0.0
@@ -305,6 +907,7 @@ class SaleOrder(models.Model):
             qty_returned = self._get_statement_returned_qty_for_sale_line(
                 line,
                 return_docs,
+                returned_index,
             )
             qty_delivered_net = self._get_statement_delivered_net_qty_for_sale_line(
                 line,
@@ -319,39 +922,24 @@ class SaleOrder(models.Model):
                 qty_delivered_net / qty_ordered * 100
             ) if qty_ordered > 0 else 0.0
 
-            line_data = {
-                'product_name': line.product_id.display_name or line.name,
-                'qty_ordered': qty_ordered,
-                'qty_delivered': qty_delivered_net,
-                'qty_delivered_net': qty_delivered_net,
-                'qty_delivered_gross': qty_delivered_gross,
-                'qty_returned': qty_returned,
-                'qty_pending': qty_pending,
-                'pct_delivered': pct_delivered,
-                'pct_delivered_net': pct_delivered,
-                'price_unit': line.price_unit,
-                'subtotal': line.price_subtotal,
-                'tax': line.price_tax,
-                'total': line.price_total,
-                'currency': currency_name,
-                'uom': line.product_uom_id.name if line.product_uom_id else 'm²',
-            }
-
-            if currency_name == 'USD' and banorte_rate > 0:
-                line_data['price_unit_alt'] = line.price_unit * banorte_rate
-                line_data['subtotal_alt'] = line.price_subtotal * banorte_rate
-                line_data['total_alt'] = line.price_total * banorte_rate
-                line_data['currency_alt'] = 'MXN'
-            elif currency_name == 'MXN' and banorte_rate > 0:
-                line_data['price_unit_alt'] = line.price_unit / banorte_rate
-                line_data['subtotal_alt'] = line.price_subtotal / banorte_rate
-                line_data['total_alt'] = line.price_total / banorte_rate
-                line_data['currency_alt'] = 'USD'
-            else:
-                line_data['price_unit_alt'] = 0.0
-                line_data['subtotal_alt'] = 0.0
-                line_data['total_alt'] = 0.0
-                line_data['currency_alt'] = 'N/A'
+            line_data = make_statement_line(
+                line.product_id.display_name or line.name,
+                line.product_uom_id.name if line.product_uom_id else 'm²',
+                qty_ordered,
+                qty_delivered_net,
+                qty_delivered_gross,
+                qty_returned,
+                qty_pending,
+                pct_delivered,
+                line.price_unit,
+                line.price_subtotal,
+                line.price_tax,
+                line.price_total,
+                *rates.convert_column(
+                    [line.price_unit, line.price_subtotal, line.price_total],
+                    currency_name, alt_currency, fallback=0.0,
+                ),
+            )
 
             if line.product_id.type == 'service':
                 service_lines.append(line_data)
@@ -361,51 +949,36 @@ class SaleOrder(models.Model):
         # Pagos
         payments_data = []
         total_paid = 0.0
-        invoices = self._get_related_invoices()
-
-        for inv in invoices:
-            for payment in inv._get_reconciled_payments():
-                payments_data.append({
-                    'name': payment.name or '',
-                    'date': str(payment.date) if payment.date else '',
-                    'amount': payment.amount,
-                    'currency': payment.currency_id.name,
-                })
-                if payment.currency_id == self.currency_id:
-                    total_paid += payment.amount
-                elif payment.currency_id.name == 'MXN' and currency_name == 'USD' and banorte_rate > 0:
-                    total_paid += payment.amount / banorte_rate
-                elif payment.currency_id.name == 'USD' and currency_name == 'MXN' and banorte_rate > 0:
-                    total_paid += payment.amount * banorte_rate
-                else:
-                    total_paid += payment.amount
+
+        for row in payment_rows:
+            payments_data.append({
+                'name': row['name'],
+                'date': row['date'],
+                'amount': row['amount'],
+                'currency': row['currency_name'],
+            })
+            total_paid += self._statement_convert_payment(
+                row['amount'],
+                row['currency_id'],
+                row['currency_name'],
+                rates,
+            )
 
         amount_total = self.amount_total
         amount_untaxed = self.amount_untaxed
         amount_tax = self.amount_tax
         balance = amount_total - total_paid
 
-        if currency_name == 'USD' and banorte_rate > 0:
-            balance_usd = balance
-            balance_mxn = balance * banorte_rate
-            total_usd = amount_total
-            total_mxn = amount_total * banorte_rate
-        elif currency_name == 'MXN' and banorte_rate > 0:
-            balance_mxn = balance
-            balance_usd = balance / banorte_rate
-            total_mxn = amount_total
-            total_usd = amount_total / banorte_rate
-        else:
-            balance_usd = balance if currency_name == 'USD' else 0.0
-            balance_mxn = balance if currency_name == 'MXN' else 0.0
-            total_usd = amount_total if currency_name == 'USD' else 0.0
-            total_mxn = amount_total if currency_name == 'MXN' else 0.0
+        # Sin tipo de cambio, la columna de la otra moneda queda en cero.
+        balance_usd, total_usd = rates.convert_column([balance, amount_total], currency_name, 'USD', fallback=0.0)
+        balance_mxn, total_mxn = rates.convert_column([balance, amount_total], currency_name, 'MXN', fallback=0.0)
 
         return {
             'order_name': self.name,
             'order_date': str(self.date_order.date()) if self.date_order else '',
             'seller_name': self.user_id.name or '',
             'currency': currency_name,
+            'currency_alt': alt_currency if has_alt else 'N/A',
             'material_lines': material_lines,
             'service_lines': service_lines,
             'return_lines': return_lines,
@@ -421,4 +994,4 @@ class SaleOrder(models.Model):
             'balance_mxn': balance_mxn,
             'total_usd': total_usd,
             'total_mxn': total_mxn,
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Representación compacta de las líneas de material y servicio del estado de cuenta."""
+from collections import namedtuple
+import sys
+
+# Columnas de una línea. La moneda y la moneda alterna son de la orden
+# (`currency`, `currency_alt`), no se repiten por línea.
+STATEMENT_LINE_FIELDS = (
+    'product_name',
+    'uom',
+    'qty_ordered',
+    'qty_delivered',        # neto de devoluciones
+    'qty_delivered_gross',
+    'qty_returned',
+    'qty_pending',
+    'pct_delivered',        # sobre lo entregado neto
+    'price_unit',
+    'subtotal',
+    'tax',
+    'total',
+    'price_unit_alt',
+    'subtotal_alt',
+    'total_alt',
+)
+
+StatementLine = namedtuple('StatementLine', STATEMENT_LINE_FIELDS)
+StatementLine.__doc__ = """Línea de material o servicio de una orden.
+
+Es una tupla: no lleva diccionario por instancia y viaja como lista en el
+JSON del snapshot y de la caché por orden. Los textos repetidos (producto,
+UdM) se internan al construirla.
+"""
+
+
+def make_statement_line(product_name, uom, *values):
+    """Construye una línea con los textos internados."""
+    return StatementLine(sys.intern(product_name or ''), sys.intern(uom or ''), *values)
+
+
+def statement_lines(rows):
+    """Itera las líneas guardadas en `orders_data` como `StatementLine`.
+
+    Acepta tuplas, las listas que deja el JSON y los dicts de snapshots
+    anteriores a la representación compacta.
+    """
+    for row in rows or ():
+        if isinstance(row, dict):
+            yield StatementLine(*(
+                row.get(name, row.get(name + '_net')) for name in STATEMENT_LINE_FIELDS
+            ))
+        else:
+            yield StatementLine._make(row)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Medición por fase (tiempo, consultas SQL, filas y tamaño) del estado de cuenta."""
+import contextlib
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+_CURRENT_KEY = 'account_statement_report.profiler'
+
+
+class StatementProfiler:
+    """Acumula fases de una generación y las guarda en `account.statement.run`.
+
+    Uso::
+
+        profiler = StatementProfiler(env, 'print')
+        with profiler.phase('order_search') as phase:
+            orders = ...
+            phase['rows'] = len(orders)
+        profiler.finish(partner=partner)
+    """
+
+    def __init__(self, env, kind, run_id=None):
+        self.env = env
+        self.kind = kind
+        self.run_id = run_id
+        self.phases = []
+        self.payload_size = 0
+        self._start = time.perf_counter()
+        self._queries_start = env.cr.sql_log_count
+
+    @classmethod
+    def current(cls, env):
+        """Profiler activo en el cursor (o None)."""
+        return env.cr.cache.get(_CURRENT_KEY)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Expone este profiler a parser y render mientras dure el bloque."""
+        previous = self.env.cr.cache.get(_CURRENT_KEY)
+        self.env.cr.cache[_CURRENT_KEY] = self
+        try:
+            yield self
+        finally:
+            self.env.cr.cache[_CURRENT_KEY] = previous
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Mide el bloque; el llamador puede llenar `rows` en el dict."""
+        info = {'name': name, 'rows': 0}
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            info['seconds'] = round(time.perf_counter() - start, 4)
+            info['queries'] = self.env.cr.sql_log_count - queries
+            self.phases.append(info)
+
+    def finish(self, partner=None, orders_count=0, lines_count=0, exchange_rate=0.0, persist=True):
+        """Guarda (o completa) el registro de la corrida y lo registra en log.
+
+        Con `persist=False` solo se registra en el log.
+        """
+        total_seconds = time.perf_counter() - self._start
+        total_queries = self.env.cr.sql_log_count - self._queries_start
+        Run = self.env['account.statement.run'].sudo()
+        threshold = float(self.env['ir.config_parameter'].sudo().get_param(
+            'account_statement_report.slow_statement_seconds', 30,
+        ))
+
+        _logger.info(
+            "ESTADO DE CUENTA [%s]: %.2fs, %s consultas, %s órdenes, %s bytes — %s",
+            self.kind, total_seconds, total_queries, orders_count, self.payload_size,
+            ', '.join('%s=%.2fs/%sq' % (p['name'], p['seconds'], p['queries']) for p in self.phases),
+        )
+
+        if not persist:
+            return Run
+
+        run = Run.browse(self.run_id).exists() if self.run_id else Run
+        vals = {
+            'partner_id': partner.id if partner else False,
+            'orders_count': orders_count,
+            'lines_count': lines_count,
+            'payload_size': self.payload_size,
+            'exchange_rate': exchange_rate,
+        }
+        vals = {key: value for key, value in vals.items() if value}
+        if run:
+            phases = json.loads(run.phases or '[]') + self.phases
+            vals.update({
+                'phases': json.dumps(phases),
+                '%s_seconds' % self.kind: total_seconds,
+                'total_seconds': run.total_seconds + total_seconds,
+                'total_queries': run.total_queries + total_queries,
+            })
+            run.write(vals)
+        else:
+            vals.update({
+                'phases': json.dumps(self.phases),
+                '%s_seconds' % self.kind: total_seconds,
+                'total_seconds': total_seconds,
+                'total_queries': total_queries,
+            })
+            run = Run.create(vals)
+        self.run_id = run.id
+
+        if run.total_seconds >= threshold:
+            run.is_slow = True
+            _logger.warning(
+                "ESTADO DE CUENTA LENTO (run %s, %.2fs >= %.2fs):\n%s",
+                run.id, run.total_seconds, threshold,
+                json.dumps(json.loads(run.phases), indent=2),
+            )
+        return run
+
+
+@contextlib.contextmanager
+def profile_phase(env, name):
+    """Fase del profiler activo, o un bloque sin medición si no hay ninguno."""
+    profiler = StatementProfiler.current(env)
+    if profiler is None:
+        yield {'name': name, 'rows': 0}
+        return
+    with profiler.phase(name) as info:
+        yield info
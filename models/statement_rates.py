@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Tabla de tipos de cambio de un estado de cuenta y conversión por columnas."""
+import logging
+
+from odoo import fields
+
+_logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'MXN'
+OVERRIDE_CURRENCY = 'USD'
+
+
+class StatementRateTable:
+    """Tipos de cambio de UN estado de cuenta, expresados en MXN por unidad.
+
+    USD usa siempre el tipo de cambio Banorte configurado; el resto de las
+    monedas usa la tasa de la compañía a la fecha del estado de cuenta. Se
+    arma una sola vez por estado de cuenta (una consulta para todas las
+    monedas) y viaja en los datos del reporte, así que el render no vuelve a
+    consultar tasas.
+
+    Sin tasa para alguna de las dos monedas, la conversión regresa `fallback`
+    (o el monto sin convertir si no se indica), igual que el reporte original
+    para USD/MXN sin tipo de cambio.
+
+    Uso::
+
+        rates = StatementRateTable.build(env, banorte_rate, ['USD', 'EUR'])
+        rates.convert(100.0, 'EUR', 'MXN')
+        rates.convert_column([10.0, 20.0], 'USD', 'MXN')
+    """
+
+    def __init__(self, banorte_rate, mxn_rates=None):
+        self.banorte_rate = banorte_rate or 0.0
+        self.mxn_rates = dict(mxn_rates or {})
+        self.mxn_rates[BASE_CURRENCY] = 1.0
+        if self.banorte_rate > 0:
+            self.mxn_rates[OVERRIDE_CURRENCY] = self.banorte_rate
+        else:
+            self.mxn_rates.pop(OVERRIDE_CURRENCY, None)
+
+    @classmethod
+    def build(cls, env, banorte_rate, currency_names=(), company=None, date=None):
+        """Tabla con la tasa de la compañía de cada moneda de `currency_names`."""
+        names = {name for name in currency_names if name and name not in (BASE_CURRENCY, OVERRIDE_CURRENCY)}
+        mxn_rates = {}
+        if names:
+            company = company or env.company
+            date = date or fields.Date.context_today(env['res.currency'])
+            Currency = env['res.currency'].sudo().with_context(active_test=False)
+            currencies = Currency.search([('name', 'in', list(names | {BASE_CURRENCY}))])
+            company_rates = currencies._get_rates(company, date)
+            by_name = {currency.name: company_rates.get(currency.id) for currency in currencies}
+            base_rate = by_name.get(BASE_CURRENCY)
+            for name in names:
+                rate = by_name.get(name)
+                if rate and base_rate:
+                    # `_get_rates`: unidades de la moneda por unidad de la compañía.
+                    mxn_rates[name] = base_rate / rate
+                else:
+                    _logger.warning("Estado de cuenta: sin tipo de cambio para %s", name)
+        return cls(banorte_rate, mxn_rates)
+
+    @classmethod
+    def from_dict(cls, values, banorte_rate=0.0):
+        """Reconstruye la tabla desde `to_dict()` (o solo con el tipo Banorte)."""
+        return cls(banorte_rate, values or {})
+
+    def to_dict(self):
+        return dict(self.mxn_rates)
+
+    def factor(self, from_currency, to_currency):
+        """Multiplicador de `from_currency` a `to_currency`, o None sin tasa."""
+        if from_currency == to_currency:
+            return 1.0
+        from_rate = self.mxn_rates.get(from_currency)
+        to_rate = self.mxn_rates.get(to_currency)
+        if not from_rate or not to_rate:
+            return None
+        return from_rate / to_rate
+
+    def convert(self, amount, from_currency, to_currency, fallback=None):
+        factor = self.factor(from_currency, to_currency)
+        if factor is None:
+            return amount if fallback is None else fallback
+        return amount * factor
+
+    def convert_column(self, amounts, from_currency, to_currency, fallback=None):
+        """Convierte una columna completa de montos con un solo factor."""
+        factor = self.factor(from_currency, to_currency)
+        if factor is None:
+            return list(amounts) if fallback is None else [fallback] * len(amounts)
+        return [amount * factor for amount in amounts]
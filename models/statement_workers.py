@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Pool de hilos con cursor propio para generar estados de cuenta en paralelo."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import api
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+THREAD_NAME_PREFIX = 'account_statement'
+
+
+def get_max_workers(env, param, default=2):
+    """Grado de paralelismo configurado, acotado por el pool de conexiones.
+
+    Cada hilo abre su propio cursor, así que se deja al menos la mitad de
+    `db_maxconn` libre para el resto del servidor.
+    """
+    try:
+        workers = int(env['ir.config_parameter'].sudo().get_param(param, default))
+    except (ValueError, TypeError):
+        workers = default
+    max_conn = int(config.get('db_maxconn') or 64)
+    return max(1, min(workers, max_conn // 2))
+
+
+def in_worker_thread():
+    """True dentro de un hilo de `run_in_workers` (evita pools anidados)."""
+    return threading.current_thread().name.startswith(THREAD_NAME_PREFIX)
+
+
+def split_chunks(items, size):
+    """Divide `items` en listas de a lo más `size` elementos."""
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_in_workers(env, chunks, worker, max_workers, readonly=False):
+    """Ejecuta `worker(worker_env, chunk)` por chunk en hilos con cursor propio.
+
+    Cada hilo usa un cursor nuevo del registry (commit al terminar bien,
+    rollback si falla; de solo lectura con `readonly`) y su propio
+    Environment con el mismo usuario y contexto. Retorna los resultados en
+    el orden de `chunks`.
+    """
+    registry = env.registry
+    dbname = env.cr.dbname
+    uid = env.uid
+    context = dict(env.context)
+
+    def _run(chunk):
+        thread = threading.current_thread()
+        thread.dbname = dbname
+        thread.uid = uid
+        with registry.cursor(readonly=readonly) as cr:
+            worker_env = api.Environment(cr, uid, context)
+            return worker(worker_env, chunk)
+
+    if max_workers <= 1 or len(chunks) <= 1:
+        return [_run(chunk) for chunk in chunks]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=THREAD_NAME_PREFIX) as executor:
+        return list(executor.map(_run, chunks))
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from . import test_order_statement
+from . import test_statement_batch
+from . import test_statement_benchmark
+from . import test_statement_indexes
+from . import test_statement_rates
+from . import test_statement_export
+from . import test_statement_pdf
+from . import test_statement_job
+from . import test_statement_aging
+from . import test_statement_lines
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import random
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+STATEMENT_REPORT_REF = 'account_statement_report.action_report_account_statement'
+
+
+class AccountStatementTestCommon(AccountTestInvoicingCommon):
+    """Cliente con órdenes USD/MXN facturadas y con pagos parciales.
+
+    Usa el mismo generador de datos que el benchmark del módulo.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('banorte.last_rate', '18.5')
+        generated = cls.env['account.statement.benchmark']._generate_data(
+            random.Random(42),
+            orders=4,
+            lines=3,
+            invoices_per_order=1,
+            payments_per_invoice=1,
+            returns_per_order=0,
+            usd_ratio=0.5,
+        )
+        cls.partner = generated['partner']
+        cls.orders = generated['orders']
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from ..models.statement_workers import run_in_workers
+from .common import AccountStatementTestCommon, STATEMENT_REPORT_REF
+
+# Modelos en los que el estado de cuenta directo de una orden no debe escribir.
+WRITE_MODELS = (
+    'account.statement.run',
+    'account.statement.order.cache',
+    'account.statement.credit.ledger',
+    'account.statement.pdf.cache',
+    'account.statement.wizard',
+    'account.statement.snapshot',
+)
+
+
+def _print_orders(env, order_ids):
+    """Worker: imprime el estado de cuenta directo de cada orden."""
+    Report = env['ir.actions.report']
+    return [
+        Report._render_qweb_pdf(STATEMENT_REPORT_REF, None, data={
+            'order_id': order.id,
+            'report_currency': order._statement_report_currency(),
+        })[0]
+        for order in env['sale.order'].browse(order_ids)
+    ]
+
+
+@tagged('post_install', '-at_install')
+class TestOrderStatement(AccountStatementTestCommon):
+
+    def _row_counts(self):
+        self.env.flush_all()
+        return {model: self.env[model].sudo().search_count([]) for model in WRITE_MODELS}
+
+    def test_direct_print_is_read_only(self):
+        """Imprimir desde la orden no inserta corridas, cachés ni wizards."""
+        before = self._row_counts()
+        content = _print_orders(self.env, self.orders[:1].ids)[0]
+        self.assertTrue(content)
+        self.assertEqual(self._row_counts(), before)
+
+    def test_direct_print_concurrent_is_read_only_and_deterministic(self):
+        """Impresiones en paralelo de las mismas órdenes coinciden y no escriben.
+
+        En modo de prueba los cursores se serializan: esto no mide el
+        escalamiento (ver `TestOrderConcurrencyBenchmark`).
+        """
+        expected = _print_orders(self.env, self.orders.ids)
+        before = self._row_counts()
+
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        results = run_in_workers(self.env, [self.orders.ids] * 4, _print_orders, 4, readonly=True)
+
+        self.assertEqual(len(results), 4)
+        for contents in results:
+            self.assertEqual(contents, expected)
+        self.assertEqual(self._row_counts(), before)
+
+    def test_expired_reference_raises(self):
+        """Una referencia cuyo snapshot y wizard ya se limpiaron pide reimprimir."""
+        wizard = self.env['account.statement.wizard'].create({
+            'partner_id': self.partner.id,
+            'include_fully_paid': True,
+        })
+        reference = wizard._prepare_report_reference()
+        self.env['account.statement.snapshot'].browse(reference['snapshot_id']).unlink()
+        wizard.unlink()
+        with self.assertRaises(UserError):
+            self.env['ir.actions.report']._render_qweb_pdf(
+                STATEMENT_REPORT_REF, [reference['wizard_id']], data=reference,
+            )
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import AccountStatementTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatementAging(AccountStatementTestCommon):
+
+    def _partner_line(self):
+        lines = self.env['account.statement.aging']._compute_aging_lines()
+        return next(vals for vals in lines if vals['partner_id'] == self.partner.id)
+
+    def test_aging_matches_order_balances(self):
+        """La antigüedad suma los mismos saldos materializados de las órdenes."""
+        self.orders[0].date_order = fields.Datetime.now() - timedelta(days=45)
+        # Fecha futura: cuenta en 0-30 días, no desaparece de los buckets.
+        self.orders[1].date_order = fields.Datetime.now() + timedelta(days=10)
+        vals = self._partner_line()
+
+        self.assertAlmostEqual(vals['balance_mxn'], sum(self.orders.mapped('x_statement_balance_mxn')), places=2)
+        owing = self.orders.filtered(lambda o: o.x_statement_balance > 0.01)
+        buckets = vals['bucket_0_30'] + vals['bucket_31_60'] + vals['bucket_61_90'] + vals['bucket_90_plus']
+        self.assertAlmostEqual(buckets, sum(owing.mapped('x_statement_balance_mxn')), places=2)
+        if self.orders[0] in owing:
+            self.assertAlmostEqual(vals['bucket_31_60'], self.orders[0].x_statement_balance_mxn, places=2)
+        self.assertEqual(vals['open_orders'], len(self.orders.filtered('x_statement_is_open')))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from ..models.statement_rates import StatementRateTable
+from .common import AccountStatementTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatementBatch(AccountStatementTestCommon):
+
+    def _build(self, orders, rates):
+        """Datos de estado de cuenta sin caché por orden ni registros en memoria."""
+        self.env.invalidate_all()
+        orders = orders.with_context(statement_cache_bypass=True)
+        data = orders._get_statement_data_batch(rates.banorte_rate, rates=rates)
+        self.env.flush_all()
+        return data
+
+    def test_query_count_independent_of_orders(self):
+        """Armar 1 orden o N órdenes cuesta el mismo número de consultas."""
+        self.assertGreater(len(self.orders), 1)
+        rates = self.orders._statement_rate_table(self.orders._statement_banorte_rate())
+        self.env.flush_all()
+        # Calienta cachés del registro (metadatos, ormcache) fuera de la medición.
+        self._build(self.orders, rates)
+
+        queries_before = self.cr.sql_log_count
+        self._build(self.orders[:1], rates)
+        single_order_queries = self.cr.sql_log_count - queries_before
+
+        with self.assertQueryCount(single_order_queries):
+            data = self._build(self.orders, rates)
+        self.assertEqual(len(data), len(self.orders))
+        self.assertEqual([od['order_name'] for od in data], self.orders.mapped('name'))
+
+    def _fingerprints(self, rates):
+        payment_rows_by_order = {order.id: [] for order in self.orders}
+        for row in self.orders._statement_payment_ledger():
+            payment_rows_by_order[row['order_id']].append(row)
+        return self.orders._statement_fingerprints(rates, payment_rows_by_order)
+
+    def _backdate(self, records):
+        """Fecha de modificación de ayer: la de hoy es la de la transacción de la prueba."""
+        records.flush_recordset()
+        self.cr.execute(SQL(
+            "UPDATE %s SET write_date = write_date - interval '1 day' WHERE id = ANY(%s)",
+            SQL.identifier(records._table), records.ids,
+        ))
+        records.invalidate_recordset(['write_date'])
+
+    def test_fingerprint_scope(self):
+        """La huella ignora tasas ajenas a la orden y cubre UdM y vendedor."""
+        order = self.orders[0]
+        self._backdate(order.order_line.product_uom_id | order.order_line.product_id.uom_id)
+        self._backdate(order.user_id)
+        self._backdate(order.user_id.partner_id)
+        before = self._fingerprints(StatementRateTable(18.5, {'EUR': 20.0}))
+        self.assertEqual(self._fingerprints(StatementRateTable(18.5, {'EUR': 21.0})), before)
+
+        order.order_line[0].product_uom_id.name = 'Unidad renombrada'
+        after_uom = self._fingerprints(StatementRateTable(18.5, {'EUR': 21.0}))
+        self.assertNotEqual(after_uom[order.id], before[order.id])
+
+        order.user_id.name = 'Vendedor renombrado'
+        after_seller = self._fingerprints(StatementRateTable(18.5, {'EUR': 21.0}))
+        self.assertNotEqual(after_seller[order.id], after_uom[order.id])
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo.tests import TransactionCase, tagged
+
+from .common import AccountStatementTestCommon
+
+_logger = logging.getLogger(__name__)
+
+PHASES = {
+    'compute_customer_credit_balance',
+    'compute_customer_credit_balance_warm',
+    'compute_available_orders_and_currency_detection',
+    'action_print_statement_cold',
+    'action_print_statement_warm',
+    'render_qweb_html',
+    'order_statement_direct_html',
+    'render_qweb_pdf',
+    'render_qweb_pdf_cached',
+}
+# Eficiencia mínima del estado de cuenta directo con N hilos (1.0 = lineal).
+MIN_CONCURRENCY_EFFICIENCY = 0.5
+MEASURES = {'seconds', 'queries', 'peak_kib', 'retained_kib', 'rss_kib', 'rss_growth_kib'}
+
+
+@tagged('post_install', '-at_install')
+class TestStatementBenchmark(AccountStatementTestCommon):
+
+    def test_benchmark_phases(self):
+        """El benchmark mide cada fase y deshace sus datos sintéticos."""
+        Partner = self.env['res.partner']
+        partners_before = Partner.search_count([])
+        result = self.env['account.statement.benchmark'].sudo()._run(
+            orders=2, lines=2, returns_per_order=0, render_pdf=True,
+        )
+        self.assertEqual({phase['name'] for phase in result['phases']}, PHASES)
+        for phase in result['phases']:
+            self.assertLessEqual(MEASURES, set(phase), phase['name'])
+        self.assertEqual(result['dataset']['order_lines'], 2 * 3)
+        self.assertEqual(Partner.search_count([]), partners_before)
+
+    def test_render_queries_do_not_grow_with_orders(self):
+        """El render QWeb solo imprime el modelo de vista: sin consultas por orden."""
+        Benchmark = self.env['account.statement.benchmark'].sudo()
+
+        def render_queries(orders):
+            result = Benchmark._run(orders=orders, lines=3, returns_per_order=0)
+            phases = {phase['name']: phase for phase in result['phases']}
+            return phases['render_qweb_html']['queries']
+
+        self.assertLessEqual(render_queries(8), render_queries(2))
+
+
+@tagged('post_install', '-at_install', '-standard', 'statement_benchmark')
+class TestStatementBenchmarkLarge(AccountStatementTestCommon):
+    """Estado de cuenta sintético de 10k líneas de material.
+
+    No corre con la suite estándar; se lanza con
+    `--test-tags statement_benchmark` y deja en el log el tiempo de render y
+    el RSS por fase (también queda el JSON adjunto del benchmark).
+    """
+
+    def test_large_statement(self):
+        result = self.env['account.statement.benchmark'].sudo()._run(
+            orders=50, lines=200, payments_per_invoice=1, returns_per_order=0, render_pdf=True,
+        )
+        self.assertEqual(result['dataset']['order_lines'], 50 * 201)
+        phases = {phase['name']: phase for phase in result['phases']}
+        for name in ('action_print_statement_cold', 'render_qweb_html', 'render_qweb_pdf'):
+            phase = phases[name]
+            _logger.info(
+                "BENCHMARK 10k líneas %s: %.3fs, %s consultas, %.1f KiB retenidos, RSS %s KiB (+%s)",
+                name, phase['seconds'], phase['queries'], phase['retained_kib'],
+                phase['rss_kib'], phase['rss_growth_kib'],
+            )
+
+
+@tagged('post_install', '-at_install', '-standard', 'statement_benchmark')
+class TestOrderConcurrencyBenchmark(TransactionCase):
+    """Escalamiento del estado de cuenta directo de orden con hilos concurrentes.
+
+    Usa órdenes confirmadas ya guardadas en la base (cada hilo abre su propio
+    cursor y no ve datos de la prueba) y sale del modo de prueba del registro
+    durante la medición, que de otro modo serializa los cursores. Se lanza
+    con `--test-tags statement_benchmark` sobre una copia de la base.
+    """
+
+    def test_order_concurrency_scales(self):
+        orders = self.env['sale.order'].search([('state', '=', 'sale')], limit=10)
+        if not orders:
+            self.skipTest("No hay órdenes confirmadas guardadas en la base.")
+        test_cr = self.registry.test_cr
+        if test_cr is not None:
+            self.registry.leave_test_mode()
+            self.addCleanup(self.registry.enter_test_mode, test_cr)
+
+        results = self.env['account.statement.benchmark'].sudo().with_context(
+            force_report_rendering=True,
+        )._run_order_concurrency(orders.ids, levels=(1, 2, 4), requests_per_worker=3)
+
+        for result in results:
+            _logger.info(
+                "BENCHMARK orden directa %s hilos: %.2f estados/s, eficiencia %.2f",
+                result['workers'], result['per_second'], result['efficiency'],
+            )
+            self.assertGreaterEqual(
+                result['efficiency'], MIN_CONCURRENCY_EFFICIENCY,
+                "%s hilos escalan por debajo del mínimo" % result['workers'],
+            )
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import base64
+
+from odoo.tests import tagged
+
+from .common import AccountStatementTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatementExport(AccountStatementTestCommon):
+
+    def test_export_lives_on_the_wizard(self):
+        """La exportación se guarda en el wizard, no como adjunto permanente."""
+        Attachment = self.env['ir.attachment'].sudo()
+        wizard = self.env['account.statement.wizard'].create({
+            'partner_id': self.partner.id,
+            'include_fully_paid': True,
+        })
+        action = wizard.action_export_csv()
+
+        self.assertIn('field=export_file', action['url'])
+        self.assertTrue(base64.b64decode(wizard.export_file).startswith('﻿Tipo'.encode()))
+        self.assertTrue(wizard.export_filename.endswith('.csv'))
+        self.assertFalse(Attachment.search_count([('res_model', '=', wizard._name)]))
+
+    def test_gc_orphan_export_attachments(self):
+        """El autovacuum borra adjuntos de exportación de wizards ya borrados."""
+        Attachment = self.env['ir.attachment'].sudo()
+        wizard = self.env['account.statement.wizard'].create({'partner_id': self.partner.id})
+        attachment = Attachment.create({
+            'name': 'Estado de Cuenta.csv',
+            'raw': b'Tipo',
+            'res_model': wizard._name,
+            'res_id': wizard.id,
+        })
+        wizard.unlink()
+        self.env.flush_all()
+        wizard._gc_export_attachments()
+        self.assertFalse(attachment.exists())
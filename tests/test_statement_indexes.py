@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from .common import AccountStatementTestCommon
+
+
+def _plan_index_names(plan):
+    """Nombres de índice usados en un plan EXPLAIN (FORMAT JSON)."""
+    names = set()
+    nodes = list(plan) if isinstance(plan, list) else [plan]
+    while nodes:
+        node = nodes.pop()
+        node = node.get('Plan', node)
+        if node.get('Index Name'):
+            names.add(node['Index Name'])
+        nodes.extend(node.get('Plans', []))
+    return names
+
+
+@tagged('post_install', '-at_install')
+class TestStatementIndexes(AccountStatementTestCommon):
+    """El planner usa los índices del módulo en las búsquedas de órdenes.
+
+    Con `enable_seqscan` apagado se comprueba que el índice es utilizable por
+    la consulta, sin depender del volumen de datos de la base de pruebas.
+    """
+
+    def _plan_indexes(self, domain):
+        SaleOrder = self.env['sale.order'].sudo()
+        query = SaleOrder._search(domain)
+        self.env.flush_all()
+        with self.cr.savepoint(flush=False):
+            self.cr.execute("SET LOCAL enable_seqscan = off")
+            self.cr.execute(SQL(
+                "EXPLAIN (FORMAT JSON) %s",
+                query.select(SQL.identifier(SaleOrder._table, 'id')),
+            ))
+            plan = self.cr.fetchone()[0]
+            self.cr.execute("SET LOCAL enable_seqscan = on")
+        return _plan_index_names(plan)
+
+    def test_base_domain_uses_index(self):
+        """La búsqueda de órdenes del wizard (`_get_base_domain`)."""
+        wizard = self.env['account.statement.wizard'].new({'partner_id': self.partner.id})
+        self.assertIn(
+            'sale_order_statement_partner_state_date_idx',
+            self._plan_indexes(wizard._get_base_domain()),
+        )
+
+    def test_credit_scan_uses_index(self):
+        """El recorrido del saldo global del cliente."""
+        self.assertIn(
+            'sale_order_statement_confirmed_partner_idx',
+            self._plan_indexes([
+                ('partner_id.commercial_partner_id', 'in', self.partner.commercial_partner_id.ids),
+                ('state', 'in', ['sale', 'done']),
+            ]),
+        )
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import new_test_user, tagged
+
+from .common import AccountStatementTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatementJob(AccountStatementTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('account_statement_report.async_line_threshold', 0)
+        cls.env['ir.config_parameter'].sudo().set_param('account_statement_report.async_order_threshold', 1)
+        cls.salesman = new_test_user(
+            cls.env, login='statement_salesman',
+            groups='sales_team.group_sale_salesman_all_leads',
+            company_id=cls.env.company.id,
+        )
+
+    def _print(self, user):
+        wizard = self.env['account.statement.wizard'].with_user(user).create({
+            'partner_id': self.partner.id,
+            'include_fully_paid': True,
+        })
+        return wizard.action_print_statement()
+
+    def _jobs(self):
+        return self.env['account.statement.job'].sudo().search([('partner_id', '=', self.partner.id)])
+
+    def test_many_orders_go_async(self):
+        """Muchas órdenes de pocas líneas también van a segundo plano."""
+        action = self._print(self.env.user)
+        self.assertEqual(action['tag'], 'display_notification')
+        self.assertEqual(len(self._jobs()), 1)
+
+    def test_same_filters_share_the_job(self):
+        """Dos usuarios con los mismos filtros comparten el job y su PDF."""
+        self._print(self.env.user)
+        job = self._jobs()
+
+        self._print(self.salesman)
+        self.assertEqual(self._jobs(), job)
+        self.assertEqual(job.subscriber_ids, self.salesman)
+
+        attachment = self.env['ir.attachment'].create({
+            'name': 'estado.pdf',
+            'raw': b'%PDF-',
+            'res_model': job._name,
+            'res_id': job.id,
+        })
+        job.write({'state': 'done', 'attachment_id': attachment.id, 'date_end': job.create_date})
+        action = self._print(self.salesman)
+        self.assertEqual(action['type'], 'ir.actions.act_url')
+        self.assertIn(str(attachment.id), action['url'])
+        self.assertEqual(self._jobs(), job)
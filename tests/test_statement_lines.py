@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import tracemalloc
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models.statement_lines import make_statement_line, statement_lines
+
+LINES = 10000
+
+
+def _line_values(i):
+    """Valores de una línea; los textos se crean de nuevo, como al leerlos del ORM."""
+    qty = float(i % 50 + 1)
+    price = 10.0 + i
+    return (
+        ''.join(['Producto ', str(i % 200)]), ''.join(['Unid', 'ades']),
+        qty, qty * 0.8, qty * 0.9, qty * 0.1, qty * 0.2, 80.0 + i % 3,
+        price, qty * price, qty * price * 0.16, qty * price * 1.16,
+        price * 18.5, qty * price * 18.5, qty * price * 1.16 * 18.5,
+    )
+
+
+def _legacy_line(values):
+    """Línea como dict, tal como la armaba el estado de cuenta antes de las tuplas."""
+    (name, uom, qty_ordered, qty_delivered, qty_delivered_gross, qty_returned, qty_pending,
+     pct_delivered, price_unit, subtotal, tax, total, price_unit_alt, subtotal_alt, total_alt) = values
+    return {
+        'product_name': name,
+        'qty_ordered': qty_ordered,
+        'qty_delivered': qty_delivered,
+        'qty_delivered_net': qty_delivered,
+        'qty_delivered_gross': qty_delivered_gross,
+        'qty_returned': qty_returned,
+        'qty_pending': qty_pending,
+        'pct_delivered': pct_delivered,
+        'pct_delivered_net': pct_delivered,
+        'price_unit': price_unit,
+        'subtotal': subtotal,
+        'tax': tax,
+        'total': total,
+        'currency': ''.join(['U', 'SD']),
+        'uom': uom,
+        'price_unit_alt': price_unit_alt,
+        'subtotal_alt': subtotal_alt,
+        'total_alt': total_alt,
+        'currency_alt': ''.join(['M', 'XN']),
+    }
+
+
+def _retained_kib(build):
+    """(KiB que siguen vivos tras `build()`, resultado)."""
+    tracemalloc.start()
+    try:
+        rows = build()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current / 1024.0, rows
+
+
+@tagged('post_install', '-at_install')
+class TestStatementLines(TransactionCase):
+
+    def test_compact_lines_retain_less_memory(self):
+        """10k líneas como tuplas retienen menos de 60% de la memoria de los dicts."""
+        dict_kib, dict_rows = _retained_kib(
+            lambda: [_legacy_line(_line_values(i)) for i in range(LINES)])
+        tuple_kib, tuple_rows = _retained_kib(
+            lambda: [make_statement_line(*_line_values(i)) for i in range(LINES)])
+        self.assertLess(tuple_kib, dict_kib * 0.6)
+
+        # Snapshots anteriores: los dicts se leen como las mismas líneas.
+        compat_kib, compat_rows = _retained_kib(lambda: list(statement_lines(dict_rows)))
+        self.assertEqual(compat_rows, tuple_rows)
+        self.assertLess(compat_kib, dict_kib)
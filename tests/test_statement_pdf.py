@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import io
+
+from reportlab.pdfgen import canvas
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools.pdf import PdfFileReader
+
+
+def _make_pdf(pages):
+    packet = io.BytesIO()
+    pdf = canvas.Canvas(packet)
+    for number in range(pages):
+        pdf.drawString(72, 720, 'Contenido %s' % (number + 1))
+        pdf.showPage()
+    pdf.save()
+    packet.seek(0)
+    return packet
+
+
+@tagged('post_install', '-at_install')
+class TestStatementPdf(TransactionCase):
+
+    def test_stamp_page_numbers_across_chunks(self):
+        """Las páginas se numeran de forma continua sobre los bloques unidos."""
+        stamped = self.env['ir.actions.report']._stamp_statement_page_numbers(
+            [_make_pdf(2), _make_pdf(1)],
+        )
+        reader = PdfFileReader(io.BytesIO(stamped), strict=False)
+        self.assertEqual(len(reader.pages), 3)
+        texts = [page.extract_text() for page in reader.pages]
+        for number, text in enumerate(texts, start=1):
+            self.assertIn('Página %s / 3' % number, text)
+        self.assertIn('Contenido 2', texts[1])
+        self.assertIn('Contenido 1', texts[2])
+
+    def test_pdf_cache_key_uses_statement_company(self):
+        """La llave de la caché de PDF usa la compañía del estado de cuenta."""
+        PdfCache = self.env['account.statement.pdf.cache']
+        parser = self.env['report.account_statement_report.account_statement']
+        other_company = self.env['res.company'].create({'name': 'Otra Compañía Estado de Cuenta'})
+        report_data = {'report_currency': 'mxn', 'orders_data': [], 'company_id': other_company.id}
+
+        company = parser._statement_company(report_data)
+        self.assertEqual(company, other_company)
+        self.assertNotEqual(
+            PdfCache._make_key(report_data, company=company),
+            PdfCache._make_key(report_data, company=self.env.company),
+        )
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from .common import AccountStatementTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestStatementRates(AccountStatementTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Recompute = self.env['account.statement.rate.recompute'].sudo()
+        self.Recompute.search([]).unlink()
+
+    def test_clear_banorte_rate_queues_recompute(self):
+        """Quitar `banorte.last_rate` (se borra el parámetro) encola el recálculo USD."""
+        Provider = self.env['account.statement.rate.provider']
+        self.assertEqual(Provider._get_banorte_rate(), 18.5)
+
+        self.env['ir.config_parameter'].sudo().set_param('banorte.last_rate', False)
+
+        self.assertFalse(self.env['ir.config_parameter'].sudo().search_count(
+            [('key', '=', 'banorte.last_rate')],
+        ))
+        self.assertIn('USD', self.Recompute.search([]).mapped('currency_name'))
+        self.assertNotEqual(Provider._get_banorte_rate(), 18.5)
+
+    def test_partner_balance_uses_new_rate_before_recompute(self):
+        """Con el recálculo pendiente el saldo global usa ya el tipo nuevo."""
+        Ledger = self.env['account.statement.credit.ledger'].sudo()
+        Ledger._get_partner_balances(self.partner, 18.5)
+
+        self.env['ir.config_parameter'].sudo().set_param('banorte.last_rate', '20.0')
+        self.assertTrue(self.Recompute.search_count([]))
+
+        balances = self.orders._statement_balance_batch(20.0)
+        expected = sum(balances[order.id]['balance_mxn'] for order in self.orders)
+        self.assertAlmostEqual(
+            Ledger._get_partner_balances(self.partner, 20.0)[self.partner.id], expected, places=2,
+        )
@@ -1,2 +1,3 @@
 # -*- coding: utf-8 -*-
 from . import account_statement_wizard
+from . import account_statement_snapshot
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import base64
+import json
+import logging
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountStatementSnapshot(models.TransientModel):
+    """Datos del estado de cuenta guardados del lado del servidor.
+
+    El wizard arma `orders_data` una sola vez y lo guarda comprimido aquí; al
+    cliente solo viaja el id del snapshot. Al ser transitorio, el vacuum de
+    Odoo lo expira; el parser reconstruye los datos desde el wizard si ya no
+    existe.
+    """
+    _name = 'account.statement.snapshot'
+    _description = 'Snapshot de Estado de Cuenta'
+
+    wizard_id = fields.Many2one('account.statement.wizard', string='Wizard', ondelete='cascade')
+    payload = fields.Binary(string='Datos (comprimidos)', attachment=False, readonly=True)
+    payload_size = fields.Integer(string='Tamaño sin comprimir (bytes)', readonly=True)
+
+    @api.model
+    def _create_from_data(self, data, wizard=None):
+        """Guarda `data` comprimido y retorna el snapshot creado."""
+        raw = json.dumps(data, default=str, separators=(',', ':')).encode()
+        snapshot = self.create({
+            'wizard_id': wizard.id if wizard else False,
+            'payload': base64.b64encode(zlib.compress(raw)),
+            'payload_size': len(raw),
+        })
+        _logger.debug(
+            'Snapshot %s: %s bytes (%s comprimidos)',
+            snapshot.id, len(raw), len(snapshot.payload or b''),
+        )
+        return snapshot
+
+    def _load_data(self):
+        """Retorna el dict guardado en el snapshot."""
+        self.ensure_one()
+        payload = self.with_context(bin_size=False).payload
+        if not payload:
+            return {}
+        return json.loads(zlib.decompress(base64.b64decode(payload)))
@@ -1,10 +1,26 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+import base64
+import csv
 import logging
+import os
+import tempfile
+from urllib.parse import urlencode
+
+import xlsxwriter
+
+from ..models.statement_lines import statement_lines
+from ..models.statement_profiler import StatementProfiler, profile_phase
 
 _logger = logging.getLogger(__name__)
 
+STATEMENT_EXPORT_HEADER = [
+    'Tipo', 'Orden', 'Fecha', 'Moneda', 'Descripción', 'Referencia',
+    'Cantidad', 'Entregado', 'Devuelto', 'Pendiente', 'UdM',
+    'P.U.', 'Importe', 'Pagado', 'Saldo',
+]
+
 
 class AccountStatementWizard(models.TransientModel):
     _name = 'account.statement.wizard'
@@ -26,20 +42,17 @@ class AccountStatementWizard(models.TransientModel):
         string='Órdenes Seleccionadas',
         help='Seleccione manualmente las órdenes a incluir.',
     )
-    available_order_ids = fields.Many2many(
-        'sale.order',
-        'account_statement_wizard_available_order_rel',
-        'wizard_id', 'order_id',
-        string='Órdenes Disponibles',
-        compute='_compute_available_orders',
-        store=False,
+    order_domain = fields.Char(
+        string='Dominio de Órdenes Disponibles',
+        compute='_compute_order_domain',
+        help='Dominio del selector de órdenes: el cliente lo pagina y filtra en el servidor.',
     )
 
     # Detección de monedas disponibles
-    has_usd_orders = fields.Boolean(compute='_compute_currency_detection', store=False)
-    has_mxn_orders = fields.Boolean(compute='_compute_currency_detection', store=False)
-    detected_usd_count = fields.Integer(string='Órdenes en USD', compute='_compute_currency_detection', store=False)
-    detected_mxn_count = fields.Integer(string='Órdenes en MXN', compute='_compute_currency_detection', store=False)
+    has_usd_orders = fields.Boolean(compute='_compute_filter_evaluation', store=False)
+    has_mxn_orders = fields.Boolean(compute='_compute_filter_evaluation', store=False)
+    detected_usd_count = fields.Integer(string='Órdenes en USD', compute='_compute_filter_evaluation', store=False)
+    detected_mxn_count = fields.Integer(string='Órdenes en MXN', compute='_compute_filter_evaluation', store=False)
 
     # Divisa del reporte — el usuario decide
     report_currency = fields.Selection([
@@ -55,6 +68,11 @@ class AccountStatementWizard(models.TransientModel):
         readonly=True, compute='_compute_exchange_rate',
     )
 
+    # Último archivo exportado (XLSX/CSV). Vive en la fila del wizard: el
+    # vacuum de transitorios lo borra junto con él, sin dejar adjuntos.
+    export_file = fields.Binary(string='Archivo Exportado', attachment=False, readonly=True)
+    export_filename = fields.Char(string='Nombre del Archivo Exportado', readonly=True)
+
     @api.depends_context('uid')
     def _compute_exchange_rate(self):
         rate = self._get_banorte_rate()
@@ -62,64 +80,51 @@ class AccountStatementWizard(models.TransientModel):
             rec.exchange_rate = rate
 
     @api.depends('partner_id', 'project_id', 'date_from', 'date_to', 'include_draft')
-    def _compute_available_orders(self):
+    def _compute_order_domain(self):
         for rec in self:
             if rec.partner_id:
-                rec.available_order_ids = rec._get_open_orders()
+                rec.order_domain = str(rec._get_open_orders_domain(serializable=True))
             else:
-                rec.available_order_ids = self.env['sale.order']
+                rec.order_domain = "[('id', '=', False)]"
 
     @api.depends('partner_id', 'project_id', 'date_from', 'date_to', 'include_draft')
-    def _compute_currency_detection(self):
+    def _compute_filter_evaluation(self):
+        """Monedas detectadas según los filtros"""
         for rec in self:
             if rec.partner_id:
-                domain = rec._get_base_domain()
-                orders = self.env['sale.order'].search(domain)
-                currencies = orders.mapped('currency_id.name')
-                rec.has_usd_orders = 'USD' in currencies
-                rec.has_mxn_orders = 'MXN' in currencies
-                rec.detected_usd_count = len(orders.filtered(lambda o: o.currency_id.name == 'USD'))
-                rec.detected_mxn_count = len(orders.filtered(lambda o: o.currency_id.name == 'MXN'))
+                currency_counts = rec._evaluate_filters()['currency_counts']
+                rec.detected_usd_count = currency_counts.get('USD', 0)
+                rec.detected_mxn_count = currency_counts.get('MXN', 0)
             else:
-                rec.has_usd_orders = False
-                rec.has_mxn_orders = False
                 rec.detected_usd_count = 0
                 rec.detected_mxn_count = 0
+            rec.has_usd_orders = rec.detected_usd_count > 0
+            rec.has_mxn_orders = rec.detected_mxn_count > 0
 
     @api.onchange('partner_id', 'project_id', 'date_from', 'date_to', 'include_draft')
     def _onchange_filters(self):
         """Cuando cambian los filtros, resetear selección y auto-detectar divisa"""
         self.order_ids = False
+        self.report_currency = self._detect_report_currency()
+
+    def _detect_report_currency(self):
+        """Divisa sugerida según las monedas de las órdenes filtradas"""
         if self.has_usd_orders and self.has_mxn_orders:
-            self.report_currency = 'both'
-        elif self.has_usd_orders:
-            self.report_currency = 'usd'
-        else:
-            self.report_currency = 'mxn'
+            return 'both'
+        if self.has_usd_orders:
+            return 'usd'
+        return 'mxn'
 
     def _get_banorte_rate(self):
-        """Obtiene el tipo de cambio Banorte del parámetro del sistema"""
-        rate_param = self.env['ir.config_parameter'].sudo().get_param('banorte.last_rate', '0')
-        try:
-            rate = float(rate_param)
-        except (ValueError, TypeError):
-            rate = 0.0
-
-        if rate <= 0:
-            usd = self.env.ref('base.USD', raise_if_not_found=False)
-            company_currency = self.env.company.currency_id
-            if usd and company_currency and company_currency.name == 'MXN':
-                rate = usd._convert(1.0, company_currency, self.env.company, fields.Date.today())
-            elif usd and company_currency and company_currency.name == 'USD':
-                mxn = self.env.ref('base.MXN', raise_if_not_found=False)
-                if mxn:
-                    rate = mxn._convert(1.0, usd, self.env.company, fields.Date.today())
-                    rate = 1 / rate if rate > 0 else 0
-
-        return rate
-
-    def _get_base_domain(self):
-        """Construye el dominio base según filtros del wizard"""
+        """Obtiene el tipo de cambio Banorte (en caché por compañía y fecha)"""
+        return self.env['account.statement.rate.provider']._get_banorte_rate()
+
+    def _get_base_domain(self, serializable=False):
+        """Construye el dominio base según filtros del wizard.
+
+        Con `serializable` las fechas van como texto, para enviar el dominio
+        al cliente web.
+        """
         domain = [('partner_id', '=', self.partner_id.id)]
 
         states = ['sale', 'done']
@@ -130,11 +135,12 @@ class AccountStatementWizard(models.TransientModel):
         if self.project_id:
             domain.append(('x_project_id', '=', self.project_id.id))
 
+        to_value = fields.Datetime.to_string if serializable else (lambda value: value)
         if self.date_from:
-            domain.append(('date_order', '>=', fields.Datetime.to_datetime(self.date_from)))
+            domain.append(('date_order', '>=', to_value(fields.Datetime.to_datetime(self.date_from))))
 
         if self.date_to:
-            domain.append(('date_order', '<=', fields.Datetime.to_datetime(self.date_to).replace(hour=23, minute=59, second=59)))
+            domain.append(('date_order', '<=', to_value(fields.Datetime.to_datetime(self.date_to).replace(hour=23, minute=59, second=59))))
 
         try:
             domain.append(('x_is_quote_backup', '=', False))
@@ -143,24 +149,37 @@ class AccountStatementWizard(models.TransientModel):
 
         return domain
 
+    def _evaluate_filters(self):
+        """Evalúa los filtros actuales.
+
+        Retorna el conteo de órdenes por moneda (un solo agregado agrupado).
+        """
+        currency_counts = {
+            currency.name: count
+            for currency, count in self.env['sale.order']._read_group(
+                self._get_base_domain(), ['currency_id'], ['__count'],
+            )
+            if currency
+        }
+        return {'currency_counts': currency_counts}
+
+    def _get_open_orders_domain(self, serializable=False):
+        """Órdenes con saldo pendiente o a favor según filtros"""
+        return self._get_base_domain(serializable=serializable) + [('x_statement_is_open', '=', True)]
+
     def _get_open_orders(self):
         """Obtiene las órdenes abiertas (con saldo pendiente) según filtros"""
-        domain = self._get_base_domain()
-        orders = self.env['sale.order'].search(domain, order='date_order asc')
-
-        open_orders = self.env['sale.order']
-        banorte_rate = self._get_banorte_rate()
-        for order in orders:
-            data = order._get_statement_data(banorte_rate)
-            # Incluye tanto saldos pendientes (positivos) como saldos a favor
-            # (negativos, cuando los pagos superan el total de la orden).
-            if abs(data['balance']) > 0.01:
-                open_orders |= order
-        return open_orders
+        return self.env['sale.order'].search(self._get_open_orders_domain(), order='date_order asc')
 
     def _get_sale_orders(self):
-        """Obtiene las órdenes de venta filtradas"""
+        """Obtiene las órdenes de venta filtradas.
+
+        Sin 'Incluir Pagadas al 100%', las liquidadas se descartan en la
+        búsqueda con el saldo materializado de la orden.
+        """
         domain = self._get_base_domain()
+        if not self.include_fully_paid:
+            domain.append(('x_statement_is_open', '=', True))
         orders = self.env['sale.order'].search(domain, order='date_order asc')
         return orders
 
@@ -180,76 +199,205 @@ class AccountStatementWizard(models.TransientModel):
         }
 
     def action_print_statement(self):
-        """Genera el reporte PDF"""
-        self.ensure_one()
+        """Genera el reporte PDF.
 
-        if self.order_ids:
-            orders = self.order_ids.sorted(key=lambda o: o.date_order or '')
+        Si el estado de cuenta estimado rebasa el umbral de órdenes o de líneas
+        configurado, se encola para generarse en segundo plano en lugar de
+        bloquear la petición.
+        """
+        self.ensure_one()
+        if not self.env.context.get('statement_force_sync'):
+            orders_count, lines_count = self._estimate_statement_size()
+            ICP = self.env['ir.config_parameter'].sudo()
+            line_threshold = int(ICP.get_param('account_statement_report.async_line_threshold', 3000))
+            order_threshold = int(ICP.get_param('account_statement_report.async_order_threshold', 200))
+            if (line_threshold and lines_count > line_threshold) or (
+                    order_threshold and orders_count > order_threshold):
+                return self._queue_statement_job(orders_count, lines_count)
+        return self.env.ref('account_statement_report.action_report_account_statement').report_action(
+            self, data=self._prepare_report_reference(),
+        )
+
+    def _estimate_statement_size(self):
+        """(órdenes, líneas) del estado de cuenta, sin armar sus datos.
+
+        Es una cota superior: aún no descuenta las órdenes pagadas al 100%.
+        """
+        self.ensure_one()
+        orders = self._get_statement_orders()
+        lines_count = self.env['sale.order.line'].search_count([
+            ('order_id', 'in', orders.ids),
+            ('display_type', '=', False),
+        ])
+        return len(orders), lines_count
+
+    def _queue_statement_job(self, orders_count, lines_count):
+        job, created = self.env['account.statement.job']._enqueue_from_wizard(
+            self, estimated_orders=orders_count, estimated_lines=lines_count,
+        )
+        if not created and job.state == 'done':
+            # Otro usuario ya generó este mismo estado de cuenta hace poco.
+            return job.action_download()
+        if created:
+            message = ("El estado de cuenta tiene %s órdenes y %s líneas; se generará en "
+                       "segundo plano y se le avisará al terminar." % (orders_count, lines_count))
         else:
-            orders = self._get_sale_orders()
+            message = "Ya hay un estado de cuenta en proceso con estos mismos filtros; se le avisará al terminar."
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'title': job.name,
+                'message': message,
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
 
-        if not orders:
-            raise UserError("No se encontraron órdenes de venta para este cliente con los filtros seleccionados.")
+    def _prepare_report_reference(self):
+        """Arma los datos, los guarda en un snapshot y retorna la referencia.
 
+        Los datos se quedan en el servidor; al cliente solo viaja la referencia.
+        """
+        self.ensure_one()
+        profiler = StatementProfiler(self.env, 'data')
+        with profiler.activate():
+            data = self._prepare_statement_data()
+            with profiler.phase('snapshot'):
+                snapshot = self.env['account.statement.snapshot']._create_from_data(data, wizard=self)
+        profiler.payload_size = snapshot.payload_size
+        run = profiler.finish(
+            partner=self.partner_id,
+            exchange_rate=data.get('banorte_rate', 0.0),
+            orders_count=len(data['orders_data']),
+            lines_count=sum(
+                len(od['material_lines']) + len(od['service_lines'])
+                for od in data['orders_data']
+            ),
+        )
+        return {'wizard_id': self.id, 'snapshot_id': snapshot.id, 'run_id': run.id}
+
+    def _render_statement_pdf(self):
+        """Renderiza el estado de cuenta fuera de una petición HTTP.
+
+        Retorna (contenido_pdf, nombre_archivo).
+        """
+        self.ensure_one()
+        pdf_content, _report_type = self.env['ir.actions.report']._render_qweb_pdf(
+            'account_statement_report.action_report_account_statement',
+            self.ids,
+            data=self._prepare_report_reference(),
+        )
+        filename = 'EDO %s %s.pdf' % (self.partner_id.name or '', fields.Date.today().strftime('%d-%m-%Y'))
+        return pdf_content, filename
+
+    def _prepare_statement_data(self):
+        """Arma el dict completo de datos del estado de cuenta"""
+        self.ensure_one()
+        orders = self._get_statement_orders()
         banorte_rate = self._get_banorte_rate()
-        report_currency = self.report_currency
+
+        rates = orders._statement_rate_table(banorte_rate)
 
         orders_data = []
-        total_balance_usd = 0.0
-        total_balance_mxn = 0.0
-        total_amount_usd = 0.0
-        total_amount_mxn = 0.0
-        total_paid_usd = 0.0
-        total_paid_mxn = 0.0
-        orders_usd_count = 0
-        orders_mxn_count = 0
-
-        for order in orders:
-            data = order._get_statement_data(banorte_rate)
-
-            # Se omiten únicamente las órdenes liquidadas (saldo ~0). Las órdenes
-            # con saldo a favor (balance negativo) sí se incluyen.
-            if not self.order_ids and not self.include_fully_paid and abs(data['balance']) <= 0.01:
-                continue
-
-            orders_data.append(data)
-            total_balance_usd += data['balance_usd']
-            total_balance_mxn += data['balance_mxn']
-            total_amount_usd += data['total_usd']
-            total_amount_mxn += data['total_mxn']
-
-            if data['currency'] == 'USD':
-                orders_usd_count += 1
-                total_paid_usd += data['total_paid']
-                total_paid_mxn += data['total_paid'] * banorte_rate if banorte_rate > 0 else 0
-            else:
-                orders_mxn_count += 1
-                total_paid_mxn += data['total_paid']
-                total_paid_usd += data['total_paid'] / banorte_rate if banorte_rate > 0 else 0
+        totals = self._new_statement_totals()
+        with profile_phase(self.env, 'order_data') as phase:
+            for data in self._iter_statement_orders_data(orders, rates):
+                orders_data.append(data)
+                self._add_statement_totals(totals, data, rates)
+            phase['rows'] = len(orders)
 
         if not orders_data:
             raise UserError("Todas las órdenes encontradas están pagadas al 100%. Active 'Incluir Pagadas al 100%' para verlas.")
 
+        data = self._statement_header(rates, totals)
+        data['orders_data'] = orders_data
+        if len(orders.company_id) == 1:
+            data['company_id'] = orders.company_id.id
+        return data
+
+    def _get_statement_orders(self):
+        """Órdenes a incluir: las seleccionadas o las de los filtros"""
+        with profile_phase(self.env, 'order_search') as phase:
+            if self.order_ids:
+                orders = self.order_ids.sorted(key=lambda o: o.date_order or '')
+            else:
+                orders = self._get_sale_orders()
+            phase['rows'] = len(orders)
+
+        if not orders:
+            has_paid_orders = not self.order_ids and not self.include_fully_paid and bool(
+                self.env['sale.order'].search_count(self._get_base_domain(), limit=1)
+            )
+            if has_paid_orders:
+                raise UserError("Todas las órdenes encontradas están pagadas al 100%. Active 'Incluir Pagadas al 100%' para verlas.")
+            raise UserError("No se encontraron órdenes de venta para este cliente con los filtros seleccionados.")
+        return orders
+
+    def _iter_statement_orders_data(self, orders, rates, chunk_size=200):
+        """Genera los datos de cada orden a incluir, por bloques de órdenes.
+
+        Solo un bloque de `chunk_size` órdenes está en memoria a la vez. Todos
+        los bloques usan la misma tabla de tipos de cambio `rates`.
+        """
+        for start in range(0, len(orders), chunk_size):
+            chunk = orders[start:start + chunk_size]
+            for data in chunk._get_statement_data_batch(rates.banorte_rate, rates=rates):
+                # Se omiten únicamente las órdenes liquidadas (saldo ~0). Las órdenes
+                # con saldo a favor (balance negativo) sí se incluyen.
+                if not self.order_ids and not self.include_fully_paid and abs(data['balance']) <= 0.01:
+                    continue
+                yield data
+            chunk.invalidate_recordset()
+
+    def _new_statement_totals(self):
+        return {
+            'total_balance_usd': 0.0,
+            'total_balance_mxn': 0.0,
+            'total_amount_usd': 0.0,
+            'total_amount_mxn': 0.0,
+            'total_paid_usd': 0.0,
+            'total_paid_mxn': 0.0,
+            'total_orders': 0,
+            'orders_usd_count': 0,
+            'orders_mxn_count': 0,
+        }
+
+    def _add_statement_totals(self, totals, data, rates):
+        """Acumula una orden en los totales del Resumen Final"""
+        totals['total_orders'] += 1
+        totals['total_balance_usd'] += data['balance_usd']
+        totals['total_balance_mxn'] += data['balance_mxn']
+        totals['total_amount_usd'] += data['total_usd']
+        totals['total_amount_mxn'] += data['total_mxn']
+
+        if data['currency'] == 'USD':
+            totals['orders_usd_count'] += 1
+        else:
+            totals['orders_mxn_count'] += 1
+        totals['total_paid_usd'] += rates.convert(data['total_paid'], data['currency'], 'USD', fallback=0.0)
+        totals['total_paid_mxn'] += rates.convert(data['total_paid'], data['currency'], 'MXN', fallback=0.0)
+
+    def _statement_header(self, rates, totals):
+        """Datos generales, totales y saldo a favor global (sin órdenes)"""
+        banorte_rate = rates.banorte_rate
         # Saldo a favor GLOBAL del cliente (todas sus órdenes confirmadas), para
         # mostrarlo en TODOS los reportes aunque la(s) orden(es) incluida(s) no
         # tengan excedente. Usa la misma lógica de balance que el reporte.
         partner = self.partner_id.commercial_partner_id or self.partner_id
-        all_client_orders = self.env['sale.order'].sudo().search([
-            ('partner_id.commercial_partner_id', '=', partner.id),
-            ('state', 'in', ['sale', 'done']),
-        ])
-        global_balance_mxn = 0.0
-        for o in all_client_orders:
-            try:
-                global_balance_mxn += o._statement_balance_mxn(banorte_rate)
-            except Exception:
-                continue
+        with profile_phase(self.env, 'customer_credit') as phase:
+            global_balance_mxn = self.env['account.statement.credit.ledger'].sudo()._get_partner_balances(
+                partner, banorte_rate,
+            ).get(partner.id, 0.0)
+            phase['rows'] = 1
         customer_credit_mxn = -global_balance_mxn if global_balance_mxn < -0.01 else 0.0
-        customer_credit_usd = (customer_credit_mxn / banorte_rate) if (customer_credit_mxn and banorte_rate > 0) else 0.0
+        customer_credit_usd = rates.convert(customer_credit_mxn, 'MXN', 'USD', fallback=0.0)
         has_customer_credit = customer_credit_mxn > 0.01
 
         data = {
             'wizard_id': self.id,
+            'company_id': self.env.company.id,
             'partner_id': self.partner_id.id,
             'partner_name': self.partner_id.name,
             'partner_vat': self.partner_id.vat or '',
@@ -257,21 +405,161 @@ class AccountStatementWizard(models.TransientModel):
             'date_from': str(self.date_from) if self.date_from else '',
             'date_to': str(self.date_to) if self.date_to else '',
             'banorte_rate': banorte_rate,
+            'currency_rates': rates.to_dict(),
             'statement_date': str(fields.Date.today()),
-            'orders_data': orders_data,
-            'total_balance_usd': total_balance_usd,
-            'total_balance_mxn': total_balance_mxn,
-            'total_amount_usd': total_amount_usd,
-            'total_amount_mxn': total_amount_mxn,
-            'total_paid_usd': total_paid_usd,
-            'total_paid_mxn': total_paid_mxn,
-            'total_orders': len(orders_data),
-            'orders_usd_count': orders_usd_count,
-            'orders_mxn_count': orders_mxn_count,
-            'report_currency': report_currency,
+            'report_currency': self.report_currency,
             'customer_credit_mxn': customer_credit_mxn,
             'customer_credit_usd': customer_credit_usd,
             'has_customer_credit': has_customer_credit,
         }
+        data.update(totals)
+        return data
+
+    # ═══════════════════════════════════════════════════════════════════
+    # Exportación XLSX / CSV
+    # ═══════════════════════════════════════════════════════════════════
+
+    def action_export_xlsx(self):
+        return self._export_statement('xlsx')
+
+    def action_export_csv(self):
+        return self._export_statement('csv')
+
+    def _export_statement(self, fmt):
+        """Exporta el estado de cuenta a XLSX o CSV sin pasar por QWeb.
+
+        Las filas se generan orden por orden y se escriben directamente a un
+        archivo temporal, por lo que la memoria no crece con el número de
+        órdenes.
+        """
+        self.ensure_one()
+        fd, path = tempfile.mkstemp(suffix='.' + fmt)
+        os.close(fd)
+        try:
+            rows = self._iter_statement_export_rows()
+            if fmt == 'xlsx':
+                self._write_statement_xlsx(path, rows)
+                mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            else:
+                self._write_statement_csv(path, rows)
+                mimetype = 'text/csv'
+            with open(path, 'rb') as f:
+                content = f.read()
+        finally:
+            os.unlink(path)
+
+        partner_name = (self.partner_id.name or 'Cliente').replace('/', '-')
+        self.write({
+            'export_file': base64.b64encode(content),
+            'export_filename': 'Estado de Cuenta - %s - %s.%s' % (partner_name, fields.Date.today(), fmt),
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content?%s' % urlencode({
+                'model': self._name,
+                'id': self.id,
+                'field': 'export_file',
+                'filename_field': 'export_filename',
+                'mimetype': mimetype,
+                'download': 'true',
+            }),
+            'target': 'self',
+        }
+
+    @api.autovacuum
+    def _gc_export_attachments(self):
+        """Borra adjuntos de exportaciones cuyo wizard ya no existe.
+
+        Las exportaciones viven ahora en `export_file`; esto limpia los
+        adjuntos que dejaron las versiones anteriores.
+        """
+        self.env.cr.execute("""
+            SELECT att.id
+              FROM ir_attachment att
+             WHERE att.res_model = %s
+               AND NOT EXISTS (
+                    SELECT 1 FROM account_statement_wizard wizard WHERE wizard.id = att.res_id
+               )
+        """, [self._name])
+        orphans = self.env['ir.attachment'].sudo().browse(row[0] for row in self.env.cr.fetchall())
+        orphans.unlink()
+        _logger.info('Estado de cuenta: %s adjuntos de exportación huérfanos borrados', len(orphans))
+
+    def _write_statement_csv(self, path, rows):
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            for row in rows:
+                writer.writerow(['' if value is None else value for value in row])
+
+    def _write_statement_xlsx(self, path, rows):
+        # constant_memory: cada fila se vacía a disco en cuanto se escribe la siguiente
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        sheet = workbook.add_worksheet('Estado de Cuenta')
+        bold = workbook.add_format({'bold': True})
+        number = workbook.add_format({'num_format': '#,##0.00'})
+        sheet.set_column(0, 3, 14)
+        sheet.set_column(4, 5, 40)
+        sheet.set_column(6, 14, 14, number)
+        for row_idx, row in enumerate(rows):
+            row_format = bold if row_idx == 0 or row[0] in ('Orden', 'Resumen') else None
+            for col, value in enumerate(row):
+                if value is None:
+                    continue
+                sheet.write(row_idx, col, value, row_format)
+        workbook.close()
+
+    def _iter_statement_export_rows(self):
+        """Genera las filas del estado de cuenta en el orden del reporte PDF:
+        por orden, materiales, servicios, devoluciones y pagos; al final el
+        Resumen Final con los mismos totales que `_prepare_statement_data`.
+        """
+        self.ensure_one()
+        orders = self._get_statement_orders()
+        banorte_rate = self._get_banorte_rate()
+        rates = orders._statement_rate_table(banorte_rate)
+        totals = self._new_statement_totals()
+
+        yield STATEMENT_EXPORT_HEADER
+        for od in self._iter_statement_orders_data(orders, rates):
+            self._add_statement_totals(totals, od, rates)
+            name, date, currency = od['order_name'], od['order_date'], od['currency']
+            yield ['Orden', name, date, currency, od['seller_name'], None,
+                   None, None, None, None, None,
+                   None, od['amount_total'], od['total_paid'], od['balance']]
+            for ml in statement_lines(od['material_lines']):
+                yield ['Material', name, date, currency, ml.product_name, None,
+                       ml.qty_ordered, ml.qty_delivered, ml.qty_returned,
+                       ml.qty_pending, ml.uom,
+                       ml.price_unit, ml.subtotal, None, None]
+            for sl in statement_lines(od['service_lines']):
+                yield ['Servicio', name, date, currency, sl.product_name, None,
+                       sl.qty_ordered, None, None, None, sl.uom,
+                       sl.price_unit, sl.subtotal, None, None]
+            for ret in od['return_lines']:
+                yield ['Devolución', name, ret['return_date'], None, ret['product_name'],
+                       ' / '.join(filter(None, [ret['return_name'], ret['lot_name']])),
+                       None, None, ret['qty_returned'], None, ret['uom'],
+                       None, None, None, None]
+            for pmt in od['payments']:
+                yield ['Pago', name, pmt['date'], pmt['currency'], None, pmt['name'],
+                       None, None, None, None, None,
+                       None, None, pmt['amount'], None]
+
+        if not totals['total_orders']:
+            raise UserError("Todas las órdenes encontradas están pagadas al 100%. Active 'Incluir Pagadas al 100%' para verlas.")
 
-        return self.env.ref('account_statement_report.action_report_account_statement').report_action(self, data=data)
\ No newline at end of file
+        summary = self._statement_header(rates, totals)
+        for label, currency, amount, paid, balance in (
+            ('Total', 'MXN', summary['total_amount_mxn'], summary['total_paid_mxn'], summary['total_balance_mxn']),
+            ('Total', 'USD', summary['total_amount_usd'], summary['total_paid_usd'], summary['total_balance_usd']),
+        ):
+            yield ['Resumen', None, summary['statement_date'], currency, label, None,
+                   None, None, None, None, None,
+                   None, amount, paid, balance]
+        if summary['has_customer_credit']:
+            yield ['Resumen', None, summary['statement_date'], 'MXN', 'Saldo a favor', None,
+                   None, None, None, None, None,
+                   None, None, None, -summary['customer_credit_mxn']]
+        yield ['Resumen', None, summary['statement_date'], None, 'Tipo de cambio Banorte', None,
+               None, None, None, None, None,
+               banorte_rate, None, None, None]